@@ -1,12 +1,69 @@
-from database_config import DATABASE_NAME, DATABASE_HOST, DATABASE_PASSWORD, DATABASE_PORT, DATABASE_USER
+from aggregation import aggregate_observations, combine_partial_aggregates, combine_station_attributes, finalize_aggregates, partial_aggregates, station_attributes
+from checkpoint import RunCheckpoint, clear_batches, committed_batches, default_checkpoint_path, expire_batches, record_batch
+from database_config import DATABASE_BACKEND, LOAD_BATCH_SIZE
+from etl_state import default_watermark_directory, load_watermarks, save_watermarks, watermark_path_for
+from extraction import SourceManifest, concat_observations, default_manifest_directory, default_read_workers, expand_source, file_signature, file_throughput, manifest_path_for, observation_keys, read_source_files, report_throughput
+from instrumentation import RunMetrics, default_metrics_path, peak_memory_mb
+from load_backends import create_load_backend
+from schema import read_observations
+from staging import StagingCache, staging_available
+from station_catalog import default_station_catalog_path, load_station_catalog
+from streaming import ObservationIndex
+from transform import TransformResult, clean_observations, transform_observations, transform_station
+from validation import ObservationValidator, default_quarantine_path, rejection_counts, write_quarantine
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import collections
+import functools
 import pandas
 import time
-from sqlalchemy import MetaData, Table, create_engine, insert, select
-from os import path
+from os import makedirs, path
 
+# SQLAlchemy y los módulos que lo usan (esquema, dimensiones, rollups y hechos diarios) se importan en la
+# etapa de carga: la extracción y la transformación, y en particular el modo sin carga, no los necesitan
+
+# Un origen por tipo de observación: un archivo, un directorio con sus CSV o un patrón glob (o una lista de ellos)
 default_base_files_csv_relative_path = [
     './data/precipitaciones.csv', './data/temperaturas.csv']
 
+source_names = ['precipitaciones', 'temperaturas']
+
+default_fact_batch_size = LOAD_BATCH_SIZE
+
+default_pool_size = 4
+
+default_shard_size = 5000
+
+default_deadlock_retries = 3
+
+# Errores de MySQL/MariaDB que se resuelven reintentando la transacción: deadlock y espera de bloqueo
+deadlock_error_codes = {1205, 1213}
+
+default_output_path = path.join(path.dirname(
+    path.realpath(__file__)), 'etl_state', 'grouped_data.csv')
+
+# Columnas agregadas de grouped_data y su columna correspondiente en fact_temprec
+fact_columns_map = {
+    ('estacion', ''): 'estacion',
+    ('mes', ''): 'mes',
+    ('año', ''): 'año',
+    ('temperatura_minima', 'mean'): 'PROMEDIO_TEMPERATURA_MINIMA',
+    ('temperatura_minima', 'min'): 'MINIMA_TEMPERATURA_MINIMA',
+    ('temperatura_minima', 'max'): 'MAXIMA_TEMPERATURA_MINIMA',
+    ('temperatura_minima', 'sum'): 'SUMA_TEMPERATURA_MINIMA',
+    ('temperatura_maxima', 'mean'): 'PROMEDIO_TEMPERATURA_MAXIMA',
+    ('temperatura_maxima', 'min'): 'MINIMA_TEMPERATURA_MAXIMA',
+    ('temperatura_maxima', 'max'): 'MAXIMA_TEMPERATURA_MAXIMA',
+    ('temperatura_maxima', 'sum'): 'SUMA_TEMPERATURA_MAXIMA',
+    ('precipitacion', 'mean'): 'PROMEDIO_PRECIPITACION',
+    ('precipitacion', 'min'): 'PRECIPITACION_MINIMA',
+    ('precipitacion', 'max'): 'PRECIPITACION_MAXIMA',
+    ('precipitacion', 'sum'): 'SUMA_PRECIPITACION',
+    ('precipitacion', 'count'): 'CANTIDAD_OBSERVACIONES',
+}
+
+fact_table_columns = ['ID_PERIODO', 'ID_ESTACION', 'ID_REGION'] + [
+    column for column in fact_columns_map.values() if column.isupper()]
+
 
 def transform_coords(coordinates_string):
     direction = {'N': 1, 'S': -1, 'E': 1, 'W': -1}
@@ -18,474 +75,746 @@ def transform_coords(coordinates_string):
     return (int(new[0])+int(new[1])/60.0+int(new[2])/3600.0) * direction[new_dir]
 
 
+def is_deadlock(error):
+    driver_error = error.orig
+    error_code = driver_error.args[0] if driver_error is not None and driver_error.args else None
+
+    return error_code in deadlock_error_codes or 'database is locked' in str(driver_error)
+
+
 class ETLMeteorologico:
-    def __init__(self, base_files_csv_relative_path=default_base_files_csv_relative_path):
-        self.db_connection = None
+    def __init__(self, base_files_csv_relative_path=default_base_files_csv_relative_path, fact_batch_size=default_fact_batch_size,
+                 incremental=False, watermark_directory=default_watermark_directory, chunk_size=None,
+                 station_catalog_path=default_station_catalog_path, staging_path=None, workers=1,
+                 pool_size=default_pool_size, shard_size=default_shard_size, backend=DATABASE_BACKEND,
+                 metrics_path=default_metrics_path, profile=None, daily_facts=False, output_path=None,
+                 quarantine_path=default_quarantine_path, checkpoint_path=default_checkpoint_path, resume=False,
+                 read_workers=default_read_workers, manifest_directory=default_manifest_directory, skip_unchanged=False):
+        # La conexión a la base de datos se abre recién al comenzar la carga
+        self.db_engine = None
         self.base_files_csv_relative_path = base_files_csv_relative_path
-        self.__connect_database()
+        self.fact_batch_size = fact_batch_size
+        # Conexiones del pool y tamaño de los fragmentos de hechos que se insertan en paralelo
+        self.pool_size = pool_size
+        self.shard_size = shard_size
+        self.deadlock_retries = default_deadlock_retries
+        # Backend de carga configurado en database_config.py (MySQL con LOAD DATA, INSERT o SQLite),
+        # por nombre o como instancia de LoadBackend
+        self.load_backend = create_load_backend(backend) if isinstance(backend, str) else backend
+        # Métricas por etapa en JSON lines y perfil opcional (cprofile o tracemalloc) de la ejecución
+        self.metrics = RunMetrics(metrics_path, profile)
+        # Con incremental se cargan solo los meses posteriores a las marcas de agua, que se guardan en
+        # watermark_directory en un archivo propio de la base de datos de destino
+        self.incremental = incremental
+        self.watermark_file_path = watermark_path_for(watermark_directory, self.load_backend.target())
+        # Con chunk_size se leen los CSV por bloques de ese número de filas
+        self.chunk_size = chunk_size
+        self.station_catalog_path = station_catalog_path
+        self.station_catalog = load_station_catalog(station_catalog_path)
+
+        # Con staging_path se guardan las observaciones limpias en Parquet para reutilizarlas
+        self.staging_path = staging_path
+        # Con más de un worker la transformación se reparte por estación en un pool de procesos
+        self.workers = workers
+        if (staging_path and not staging_available()):
+            print('pyarrow no está instalado, se omite el staging en Parquet.')
+            self.staging_path = None
+
+        # Con daily_facts se cargan las observaciones diarias de joined_dataframes en fact_temprec_diaria
+        # y los hechos mensuales se derivan de ellas en la base de datos
+        self.daily_facts = daily_facts
+        if (daily_facts and chunk_size):
+            print('La lectura por bloques no conserva las observaciones diarias, se omite fact_temprec_diaria.')
+            self.daily_facts = False
+
+        # Las observaciones rechazadas por la validación se escriben en quarantine_path (None para omitirlas)
+        self.quarantine_path = quarantine_path
+
+        # La salida de la transformación se guarda en checkpoint_path antes de cargar. Con resume, una
+        # carga interrumpida se reanuda desde ese checkpoint y sus lotes ya confirmados se omiten
+        self.checkpoint = RunCheckpoint(checkpoint_path)
+        self.resume = resume
+
+        # Con output_path solo se extrae y transforma: grouped_data se escribe en ese archivo y no se
+        # usa la base de datos
+        self.output_path = output_path
+
+        # Los archivos de cada origen se leen en paralelo en read_workers hilos. Cada carga registra los
+        # archivos leídos en un manifiesto de manifest_directory propio de la base de datos de destino. Con
+        # skip_unchanged se omiten los que no cambiaron desde la última carga en ese destino; el staging y la
+        # salida sin carga necesitan todas las observaciones, y la lectura por bloques lee todos los archivos.
+        # Omitir es opcional: si la base de datos se reconstruye en el mismo destino, el manifiesto no lo sabe
+        self.read_workers = read_workers
+        manifest_path = None if manifest_directory is None else manifest_path_for(
+            manifest_directory, self.load_backend.target())
+        self.manifest = SourceManifest(manifest_path)
+        self.skip_unchanged = skip_unchanged and manifest_path is not None and not (
+            self.staging_path or output_path or chunk_size)
 
     def __del__(self):
-        if(self.db_connection):
-            self.db_connection.close()
+        if(self.db_engine):
+            self.db_engine.dispose()
 
-    def __extract(self):
-        self.dataframe_precipitaciones = pandas.read_csv(path.dirname(
-            path.realpath(__file__)) + self.base_files_csv_relative_path[0], encoding='latin-1', delimiter=';')
+    def __source_files(self, source_index):
+        # Rutas relativas al directorio del proyecto; las absolutas se usan tal cual
+        return expand_source(self.base_files_csv_relative_path[source_index], path.dirname(path.realpath(__file__)))
 
-        self.dataframe_temperaturas = pandas.read_csv(path.dirname(
-            path.realpath(__file__)) + self.base_files_csv_relative_path[1], encoding='latin-1', delimiter=';')
+    def __extract(self):
+        # Devuelve False si ningún archivo cambió desde la última carga y no hay nada que procesar
+        files = [(source_name, file_path) for source_index, source_name in enumerate(source_names)
+                 for file_path in self.__source_files(source_index)]
+
+        self.staging_cache = None
+        if (self.staging_path):
+            self.staging_cache = StagingCache.for_sources(
+                self.staging_path, [file_path for source_name, file_path in files], self.station_catalog_path)
+
+            # Con los CSV sin cambios se reutilizan las observaciones limpias del staging
+            if (self.staging_cache.has('precipitaciones') and self.staging_cache.has('temperaturas')):
+                print('Usando staging %s, se omite la lectura de los CSV.' % (self.staging_cache.key))
+                self.dataframe_precipitaciones = None
+                self.dataframe_temperaturas = None
+                return True
+
+        changed_files = files
+        if (self.skip_unchanged):
+            with self.metrics.stage('extract.manifiesto', len(files)) as stage:
+                changed_files = [(source_name, file_path) for source_name, file_path in files
+                                 if not self.manifest.unchanged(file_path, file_signature(file_path))]
+                stage['rows_out'] = len(changed_files)
+
+        with self.metrics.stage('extract.lectura', len(changed_files)) as stage:
+            source_files = read_source_files(changed_files, self.station_catalog, self.read_workers)
+            stage['rows_out'] = sum(len(source_file.observations) for source_file in source_files)
+            stage['archivos'] = [file_throughput(source_file) for source_file in source_files]
+
+        if (self.skip_unchanged):
+            # Los archivos sin cambios que comparten pares (estacion, año) con los modificados se leen igual:
+            # esos grupos se recalculan con las observaciones de ambos orígenes
+            changed_keys = set().union(*[source_file.keys | self.manifest.keys(source_file.file_path)
+                                         for source_file in source_files])
+            related_files = [(source_name, file_path) for source_name, file_path in files if (
+                source_name, file_path) not in changed_files and self.manifest.keys(file_path) & changed_keys]
+            with self.metrics.stage('extract.lectura_relacionados', len(related_files)) as stage:
+                related_source_files = read_source_files(
+                    related_files, self.station_catalog, self.read_workers)
+                stage['rows_out'] = sum(len(source_file.observations) for source_file in related_source_files)
+                stage['archivos'] = [file_throughput(source_file) for source_file in related_source_files]
+            source_files += related_source_files
+
+            if (len(source_files) < len(files)):
+                print('%s de %s archivos sin cambios desde la última carga, se omiten.' % (
+                    len(files) - len(source_files), len(files)))
+
+        if (not source_files):
+            return False
+
+        report_throughput(source_files)
+        for source_file in source_files:
+            self.manifest.record(source_file.file_path, source_file.signature, source_file.keys)
+
+        # Cada origen se concatena en el orden de sus archivos, sin importar el orden de lectura
+        file_positions = {file: position for position, file in enumerate(files)}
+        source_files.sort(key=lambda source_file: file_positions[(source_file.source_name, source_file.file_path)])
+        with self.metrics.stage('extract.concatenacion') as stage:
+            self.dataframe_precipitaciones = concat_observations([source_file.observations for source_file in source_files
+                                                                  if source_file.source_name == 'precipitaciones'], 'precipitaciones')
+            self.dataframe_temperaturas = concat_observations([source_file.observations for source_file in source_files
+                                                               if source_file.source_name == 'temperaturas'], 'temperaturas')
+            stage['rows_out'] = len(self.dataframe_precipitaciones) + len(self.dataframe_temperaturas)
+
+        return True
 
     def __transform(self):
-        # Corregir el símbolo de grados (°) en el campo "latitud" de ambos set de datos
-        self.dataframe_temperaturas["latitud"] = self.dataframe_temperaturas['latitud'].apply(
-            lambda x: x.replace('&deg', '°'))
-        self.dataframe_precipitaciones["latitud"] = self.dataframe_precipitaciones['latitud'].apply(
-            lambda x: x.replace('&deg', '°'))
-
-        # Corregir y normalizar nombres de las estaciones en los CSV de temperaturas y precipitaciones
-        self.__clean_station_names()
-
-        # Agregar campo "region" al set de datos
-        self.__add_regions()
-
-        # Eliminar registros que tengan campos en "NaN"
-        self.dataframe_precipitaciones.dropna(inplace=True)
-        self.dataframe_temperaturas.dropna(inplace=True)
-
-        # Limpiar campo temperatura_maxima  (se eliminan caracteres coma (,) que están en el dataset)
-        self.dataframe_temperaturas["temperatura_maxima"] = self.dataframe_temperaturas['temperatura_maxima'].apply(
-            lambda row: row.replace(",", ""))
-
-        # Transformar columna temperatura_maxima a numérico
-        self.dataframe_temperaturas["temperatura_maxima"] = pandas.to_numeric(
-            self.dataframe_temperaturas["temperatura_maxima"])
-
-        # Transformar formato de latitudeear
-        self.dataframe_precipitaciones["latitud"] = self.dataframe_precipitaciones['latitud'].apply(
-            lambda x: transform_coords(x))
-        self.dataframe_temperaturas["latitud"] = self.dataframe_temperaturas['latitud'].apply(
-            lambda x: transform_coords(x))
-
-        # Resetear indices de los dataframe tras las transformaciones
-        self.dataframe_precipitaciones.reset_index(drop=True, inplace=True)
-        self.dataframe_temperaturas.reset_index(drop=True, inplace=True)
-
-        # Dataframe de temperatura y precipitacion juntos por campos en común
-        joined_dataframes = self.dataframe_precipitaciones.merge(
-            self.dataframe_temperaturas, how='inner')
-        self.joined_dataframes = joined_dataframes
-
-        # Dataframes de temperatura y precipitacion unidos y resumidos con promedio y minmax para 'temperatura_minima', 'temperatura_maxima' y 'precipitacion'
-        grouped_data = joined_dataframes.groupby(['estacion', 'mes', 'año'], as_index=False).agg({'temperatura_minima': [
-            'mean', 'min', 'max'], 'temperatura_maxima': ['mean', 'min', 'max'], 'precipitacion': ['mean', 'min', 'max', 'sum']})
-        self.grouped_data = grouped_data
+        staged = self.staging_cache is not None and self.staging_cache.has(
+            'precipitaciones') and self.staging_cache.has('temperaturas')
+
+        if (staged and not self.incremental and self.staging_cache.has('joined_dataframes')):
+            # Pasar directo a la agregación
+            self.dataframe_precipitaciones = None
+            self.dataframe_temperaturas = None
+            with self.metrics.stage('transform.staging_read') as stage:
+                self.joined_dataframes = self.staging_cache.read('joined_dataframes')
+                stage['rows_out'] = len(self.joined_dataframes)
+            with self.metrics.stage('transform.agregacion', len(self.joined_dataframes)) as stage:
+                self.grouped_data = aggregate_observations(self.joined_dataframes)
+                self.station_attributes = station_attributes(self.joined_dataframes)
+                # Las observaciones del staging ya fueron validadas
+                self.rejected = None
+                stage['rows_out'] = len(self.grouped_data)
+            return
+
+        if (staged):
+            with self.metrics.stage('transform.staging_read') as stage:
+                self.dataframe_precipitaciones = self.staging_cache.read('precipitaciones')
+                self.dataframe_temperaturas = self.staging_cache.read('temperaturas')
+                stage['rows_out'] = len(self.dataframe_precipitaciones) + len(self.dataframe_temperaturas)
+        else:
+            # Corregir y normalizar nombres de las estaciones y agregar campo "region" según el catálogo
+            with self.metrics.stage('transform.catalogo', len(self.dataframe_precipitaciones) + len(
+                    self.dataframe_temperaturas)) as stage:
+                self.station_catalog.normalize(
+                    self.dataframe_precipitaciones, 'precipitaciones')
+                self.station_catalog.normalize(
+                    self.dataframe_temperaturas, 'temperaturas')
+                stage['rows_out'] = stage['rows_in']
+
+        # En modo incremental, conservar solo los meses de cada estación con observaciones nuevas
+        watermark_dates = self.__watermark_dates() if self.incremental else None
+
+        if (self.workers > 1):
+            with self.metrics.stage('transform.paralelo', len(self.dataframe_precipitaciones) + len(
+                    self.dataframe_temperaturas)) as stage:
+                result = self.__transform_parallel(staged, watermark_dates)
+                stage['rows_out'] = len(result.grouped_data)
+        else:
+            result = transform_observations(
+                self.dataframe_precipitaciones, self.dataframe_temperaturas, staged, watermark_dates, self.metrics)
+
+        self.dataframe_precipitaciones = result.dataframe_precipitaciones
+        self.dataframe_temperaturas = result.dataframe_temperaturas
+        self.joined_dataframes = result.joined_dataframes
+        self.grouped_data = result.grouped_data
+        self.station_attributes = result.station_attributes
+        self.rejected = result.rejected
+
+        if (self.incremental):
+            print('Modo incremental: %s grupos (estacion, mes, año) afectados.' % (len(self.grouped_data)))
+
+        if (self.staging_cache is not None):
+            with self.metrics.stage('transform.staging_write') as stage:
+                if (not staged):
+                    self.staging_cache.write('precipitaciones', self.dataframe_precipitaciones)
+                    self.staging_cache.write('temperaturas', self.dataframe_temperaturas)
+                if (not self.incremental):
+                    self.staging_cache.write('joined_dataframes', self.joined_dataframes)
+
+    def __transform_parallel(self, cleaned, watermark_dates):
+        # Toda la agregación es por estación: cada estación se limpia, cruza y agrega en un proceso aparte
+        precipitation_by_station = dict(iter(self.dataframe_precipitaciones.groupby(
+            'estacion', observed=True)))
+        temperature_by_station = dict(iter(self.dataframe_temperaturas.groupby(
+            'estacion', observed=True)))
+        stations = sorted(set(precipitation_by_station) | set(temperature_by_station))
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            tasks = [executor.submit(transform_station, station,
+                                     precipitation_by_station.get(station, self.dataframe_precipitaciones.iloc[0:0]),
+                                     temperature_by_station.get(station, self.dataframe_temperaturas.iloc[0:0]),
+                                     cleaned, watermark_dates) for station in stations]
+            results = [task.result() for task in tasks]
+
+        # Tiempo de cada paso acumulado por proceso
+        worker_timings = {}
+        for station, worker_id, result in results:
+            timings = worker_timings.setdefault(worker_id, collections.Counter())
+            timings.update(result.timings)
+            timings['estaciones'] += 1
+
+        for worker_id, timings in sorted(worker_timings.items()):
+            print('Proceso %s: %s estaciones, limpieza %.3f s, validación %.3f s, join %.3f s, agregación %.3f s.' % (
+                worker_id, timings['estaciones'], timings['limpieza'], timings['validacion'], timings['join'],
+                timings['agregacion']))
+
+        # Las estaciones vienen en orden, por lo que los grupos quedan en el mismo orden que en la ruta serial
+        results = [result for station, worker_id, result in results]
+        return TransformResult(*[pandas.concat([getattr(result, field) for result in results], ignore_index=True)
+                                 for field in TransformResult._fields[:-1]], {})
+
+    def __extract_and_transform_chunked(self):
+        # Las temperaturas se indexan completas pero de forma compacta (llave entera y valores),
+        # ya que son el lado derecho del join
+        temperature_index = ObservationIndex(
+            ['temperatura_minima', 'temperatura_maxima'])
+        # La validación conserva las llaves ya vistas para descartar duplicados entre bloques
+        self.validator = ObservationValidator()
+        with self.metrics.stage('extract_transform.temperaturas', 0) as stage:
+            for chunk in self.__read_csv_chunks(1, 'temperaturas'):
+                stage['rows_in'] += len(chunk)
+                temperature_index.add(self.__clean_temperaturas(chunk))
+            temperature_index.build()
+            stage['rows_out'] = len(temperature_index)
+
+        # Las precipitaciones se procesan por bloques y se acumulan en componentes por grupo
+        accumulated_aggregates = None
+        accumulated_attributes = None
+        with self.metrics.stage('extract_transform.precipitaciones', 0) as stage:
+            for chunk in self.__read_csv_chunks(0, 'precipitaciones'):
+                stage['rows_in'] += len(chunk)
+                joined_chunk = temperature_index.join(
+                    self.__clean_precipitaciones(chunk))
+
+                if (len(joined_chunk)):
+                    accumulated_aggregates = combine_partial_aggregates(
+                        accumulated_aggregates, partial_aggregates(joined_chunk))
+                    accumulated_attributes = combine_station_attributes(
+                        accumulated_attributes, station_attributes(joined_chunk))
+            stage['rows_out'] = 0 if accumulated_aggregates is None else len(accumulated_aggregates)
+
+        if (accumulated_aggregates is None):
+            raise ValueError('No hay observaciones en común entre precipitaciones y temperaturas.')
+
+        if (self.incremental):
+            watermark_dates = self.__watermark_dates()
+            stations = pandas.Series(
+                accumulated_aggregates.index.get_level_values('estacion'))
+            new_groups = ~(accumulated_aggregates[('fecha', 'max')].values <= stations.map(
+                watermark_dates).values)
+            accumulated_aggregates = accumulated_aggregates.loc[new_groups]
+            print('Modo incremental: %s grupos (estacion, mes, año) afectados.' % (len(accumulated_aggregates)))
+
+        self.dataframe_precipitaciones = None
+        self.dataframe_temperaturas = None
+        self.joined_dataframes = None
+        self.grouped_data = finalize_aggregates(accumulated_aggregates)
+        self.station_attributes = accumulated_attributes
+        self.rejected = self.validator.rejected_rows()
+
+    def __read_csv_chunks(self, source_index, source_name):
+        # Los archivos del origen, uno tras otro y por bloques, registrando cada uno en el manifiesto
+        for file_path in self.__source_files(source_index):
+            signature = file_signature(file_path)
+            keys = set()
+            for chunk in read_observations(file_path, source_name, chunksize=self.chunk_size):
+                keys |= observation_keys(chunk, self.station_catalog)
+                yield chunk
+            self.manifest.record(file_path, signature, keys)
+
+    def __load_rollups(self):
+        from rollups import refresh_rollups
+
+        # Rollups región x mes, región x año y estación x año de los periodos recién cargados
+        if (self.__committed_batches('rollups')):
+            print('Rollups ya actualizados en la ejecución que se reanuda.')
+            return
+
+        with self.db_engine.begin() as connection:
+            refreshed = refresh_rollups(connection, self.loaded_period_ids)
+            record_batch(connection, self.checkpoint.run_id, 'rollups', 0)
+
+        if (refreshed):
+            print('Rollups actualizados para %s periodos (%s años).' % (refreshed['periodos'], refreshed['años']))
+
+    def __load_shards(self, records, insert_batch, stage):
+        # Los hechos se dividen en fragmentos que se insertan en paralelo, cada uno en su propia
+        # conexión y transacción. Los fragmentos son deterministas a partir del checkpoint, por lo que al
+        # reanudar se omiten los ya confirmados
+        shards = [records[shard_start:shard_start + self.shard_size]
+                  for shard_start in range(0, len(records), self.shard_size)]
+        committed_shards = self.__committed_batches(stage)
+        pending_shards = [(shard_index, shard) for shard_index, shard in enumerate(shards)
+                          if shard_index not in committed_shards]
+
+        with ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+            tasks = [executor.submit(self.__load_fact_shard, shard, insert_batch, stage, shard_index)
+                     for shard_index, shard in pending_shards]
+            for task in tasks:
+                task.result()
+
+        # Filas y fragmentos insertados en esta ejecución, y fragmentos omitidos por estar ya confirmados
+        return sum(len(shard) for shard_index, shard in pending_shards), len(pending_shards), len(shards) - len(pending_shards)
+
+    def __committed_batches(self, stage):
+        with self.db_engine.connect() as connection:
+            return committed_batches(connection, self.checkpoint.run_id, stage)
+
+    def __insert_fact_batch(self, connection, batch):
+        from sqlalchemy import tuple_, update
+
+        # Retirar (VIGENTE = 0) los hechos vigentes de los grupos recalculados e insertar los nuevos
+        retire_facts = update(self.fact_table).where(
+            tuple_(self.fact_table.c.ID_ESTACION, self.fact_table.c.ID_PERIODO).in_(
+                [(record['ID_ESTACION'], record['ID_PERIODO']) for record in batch]),
+            self.fact_table.c.VIGENTE == 1).values(VIGENTE=0)
+
+        connection.execute(retire_facts)
+        self.load_backend.insert_rows(connection, self.fact_table, batch)
+
+    def __insert_daily_fact_batch(self, connection, batch):
+        self.load_backend.insert_rows(connection, self.daily_fact_table, batch)
+
+    def __load_fact_shard(self, shard, insert_batch, stage, shard_index):
+        from sqlalchemy.exc import DBAPIError
+
+        for attempt in range(1, self.deadlock_retries + 1):
+            try:
+                # Todo el fragmento, insertado por lotes, dentro de una sola transacción que también lo
+                # registra como confirmado
+                with self.db_engine.begin() as connection:
+                    for batch_start in range(0, len(shard), self.fact_batch_size):
+                        insert_batch(connection, shard[batch_start:batch_start + self.fact_batch_size])
+                    record_batch(connection, self.checkpoint.run_id, stage, shard_index)
+                return
+            except DBAPIError as error:
+                if (not is_deadlock(error) or attempt == self.deadlock_retries):
+                    raise
+
+                print('Deadlock al insertar un fragmento de hechos, reintento %s de %s.' % (
+                    attempt, self.deadlock_retries - 1))
+                time.sleep(0.1 * 2 ** attempt)
+
+    def __clean_precipitaciones(self, dataframe):
+        # Corregir y normalizar nombres de las estaciones y agregar campo "region" según el catálogo
+        self.station_catalog.normalize(dataframe, 'precipitaciones')
+
+        return self.validator.validate(clean_observations(dataframe), 'precipitaciones')
+
+    def __clean_temperaturas(self, dataframe):
+        # Corregir y normalizar nombres de las estaciones y agregar campo "region" según el catálogo
+        # (temperatura_maxima ya viene limpia y numérica desde la lectura, ver schema.py)
+        self.station_catalog.normalize(dataframe, 'temperaturas')
+
+        return self.validator.validate(clean_observations(dataframe), 'temperaturas')
+
+    def __watermark_dates(self):
+        watermarks = load_watermarks(self.watermark_file_path)
+        return pandas.Series({station: year * 10000 + month * 100 + day for station,
+                              (year, month, day) in watermarks.items()}, dtype='float64')
+
+    def __update_watermarks(self):
+        watermarks = load_watermarks(self.watermark_file_path)
+
+        for station, last_date in self.station_attributes[['estacion', 'fecha']].itertuples(index=False, name=None):
+            last_date = (last_date // 10000, last_date // 100 % 100, last_date % 100)
+            watermarks[station] = max(watermarks.get(station, (0, 0, 0)), last_date)
+
+        save_watermarks(self.watermark_file_path, watermarks)
 
     def __load(self):
-        self.__load_regions()
-        self.__load_stations()
-        self.__load_periods()
-        self.__load_fact_table()
+        with self.metrics.stage('load.conexion'):
+            self.__connect_database()
+
+        # Solo la ejecución del checkpoint se puede reanudar: los lotes de las demás se descartan
+        with self.db_engine.begin() as connection:
+            expire_batches(connection, self.checkpoint.run_id)
+
+        # Las tres dimensiones son independientes entre sí: se cargan en paralelo, cada una en su
+        # propia conexión del pool
+        with self.metrics.stage('load.dimensiones'):
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                tasks = [executor.submit(load_dimension) for load_dimension in (
+                    self.__load_regions, self.__load_stations, self.__load_periods)]
+                for task in tasks:
+                    task.result()
+
+        if (self.daily_facts):
+            with self.metrics.stage('load.fact_table_diaria', len(self.joined_dataframes)) as stage:
+                stage['rows_out'] = self.__load_daily_fact_table()
+            with self.metrics.stage('load.fact_table', stage['rows_out']) as stage:
+                stage['rows_out'] = self.__derive_fact_table()
+        else:
+            with self.metrics.stage('load.fact_table', len(self.grouped_data)) as stage:
+                stage['rows_out'] = self.__load_fact_table()
+        with self.metrics.stage('load.rollups', len(self.loaded_period_ids)):
+            self.__load_rollups()
+        with self.metrics.stage('load.watermarks', len(self.station_attributes)):
+            self.__update_watermarks()
+        # Los archivos leídos quedan como cargados recién al terminar la carga
+        with self.metrics.stage('load.manifiesto', len(self.manifest.pending)):
+            self.manifest.save()
         return
 
     def run(self):
         start_time = time.time()
 
-        self.__extract()
-        self.__transform()
-        self.__load()
+        resumed = self.resume and not self.output_path and self.checkpoint.exists()
+        if (self.resume and not resumed):
+            print('No hay una carga interrumpida que reanudar, se ejecuta el ETL completo.')
+
+        with self.metrics.profiling():
+            self.__run_stages(resumed)
 
         execution_time = (time.time() - start_time)
         print('ETL finalizado en %s segundos.' % (execution_time))
 
-    def __connect_database(self):
+        memory_peak = peak_memory_mb()
+        if (memory_peak is not None):
+            print('Memoria máxima utilizada: %.1f MB.' % (memory_peak))
+
+        self.metrics.report()
+        self.metrics.write()
+        if (self.metrics.metrics_path):
+            print('Métricas por etapa guardadas en %s.' % (self.metrics.metrics_path))
+
+    def __run_stages(self, resumed):
+        if (resumed):
+            with self.metrics.stage('checkpoint.lectura') as stage:
+                self.__restore_checkpoint()
+                stage['rows_out'] = len(self.grouped_data)
+        elif (self.chunk_size):
+            with self.metrics.stage('extract_transform') as stage:
+                self.__extract_and_transform_chunked()
+                stage['rows_out'] = len(self.grouped_data)
+        else:
+            with self.metrics.stage('extract') as stage:
+                extracted = self.__extract()
+                if (extracted and self.dataframe_precipitaciones is not None):
+                    stage['rows_out'] = len(self.dataframe_precipitaciones) + len(self.dataframe_temperaturas)
+            if (not extracted):
+                print('Ningún archivo cambió desde la última carga, no hay nada que procesar.')
+                return
+            with self.metrics.stage('transform', stage['rows_out']) as stage:
+                self.__transform()
+                stage['rows_out'] = len(self.grouped_data)
+        if (not resumed):
+            self.__quarantine_rejected()
+
+        if (self.output_path):
+            with self.metrics.stage('output', len(self.grouped_data)) as stage:
+                self.__write_grouped_data()
+                stage['rows_out'] = len(self.grouped_data)
+            return
+
+        if (not resumed):
+            with self.metrics.stage('checkpoint.escritura', len(self.grouped_data)):
+                self.checkpoint.start(self.metrics.run_id, self.__checkpoint_frames(), {
+                    'shard_size': self.shard_size, 'fact_batch_size': self.fact_batch_size})
         try:
-            self.db_connection = create_engine("mysql+pymysql://%s:%s@%s:%s/%s" % (
-                DATABASE_USER, DATABASE_PASSWORD, DATABASE_HOST, DATABASE_PORT, DATABASE_NAME)).connect()
+            with self.metrics.stage('load', len(self.grouped_data)):
+                self.__load()
+        except Exception:
+            if (self.checkpoint.exists()):
+                print('La carga no terminó. Para reanudarla desde el último lote confirmado: python ./main.py --resume')
+            raise
+        self.__clear_checkpoint()
+
+    def __checkpoint_frames(self):
+        # Lo necesario para la carga; las observaciones diarias solo si se cargan en fact_temprec_diaria
+        return {'grouped_data': self.grouped_data, 'station_attributes': self.station_attributes,
+                'joined_dataframes': self.joined_dataframes if self.daily_facts else None}
+
+    def __restore_checkpoint(self):
+        frames = self.checkpoint.restore()
+        print('Reanudando la carga de la ejecución %s desde su checkpoint.' % (self.checkpoint.run_id))
+
+        # Los lotes confirmados se identifican por su número: se reanuda con los tamaños de la ejecución
+        # original, porque con otros los números corresponderían a otras filas
+        settings = self.checkpoint.settings
+        if ((settings['shard_size'], settings['fact_batch_size']) != (self.shard_size, self.fact_batch_size)):
+            print('Se usan los tamaños de la ejecución que se reanuda: fragmentos de %s y lotes de %s filas.' % (
+                settings['shard_size'], settings['fact_batch_size']))
+        self.shard_size = settings['shard_size']
+        self.fact_batch_size = settings['fact_batch_size']
+
+        self.grouped_data = frames['grouped_data']
+        self.station_attributes = frames['station_attributes']
+        self.joined_dataframes = frames.get('joined_dataframes')
+        if (self.daily_facts and self.joined_dataframes is None):
+            print('El checkpoint no tiene observaciones diarias, se omite fact_temprec_diaria.')
+            self.daily_facts = False
+
+    def __clear_checkpoint(self):
+        # Carga completa: ya no hay nada que reanudar
+        with self.db_engine.begin() as connection:
+            clear_batches(connection, self.checkpoint.run_id)
+        self.checkpoint.clear()
+
+    def __quarantine_rejected(self):
+        if (self.rejected is None or not len(self.rejected)):
+            return
+
+        # Rechazos por estación y motivo, y archivo de cuarentena con las filas y su motivo
+        print('Validación: %s observaciones rechazadas.' % (len(self.rejected)))
+        for station, counts in rejection_counts(self.rejected).iterrows():
+            print('  %s: %s' % (station, ', '.join('%s %s' % (reason, count) for reason, count in counts.items() if count)))
+
+        if (self.quarantine_path):
+            quarantine_file_path = write_quarantine(self.rejected, self.quarantine_path, self.metrics.run_id)
+            print('Observaciones rechazadas guardadas en %s.' % (quarantine_file_path))
+
+    def __write_grouped_data(self):
+        # Columnas aplanadas (temperatura_minima_mean, ...); Parquet si el archivo termina en .parquet
+        grouped_data = self.grouped_data.copy()
+        grouped_data.columns = ['_'.join(filter(None, column)) for column in grouped_data.columns]
+
+        if (path.dirname(self.output_path)):
+            makedirs(path.dirname(self.output_path), exist_ok=True)
+        if (self.output_path.endswith('.parquet')):
+            grouped_data.to_parquet(self.output_path, index=False)
+        else:
+            grouped_data.to_csv(self.output_path, index=False)
+
+        print('%s grupos (estacion, mes, año) escritos en %s, sin cargar la base de datos.' % (
+            len(grouped_data), self.output_path))
 
-            if (self.db_connection):
-                print('Conexión a la base de datos exitosa!')
+    def __connect_database(self):
+        if (self.db_engine is not None):
+            return
 
-            # Cargar tablas a atributos globales
-            self.fact_table = Table('fact_temprec', MetaData(
-                bind=self.db_connection), autoload=True)
-            self.period_table = Table('dim_periodo', MetaData(
-                bind=self.db_connection), autoload=True)
-            self.station_table = Table('dim_estacion', MetaData(
-                bind=self.db_connection), autoload=True)
-            self.region_table = Table('dim_region', MetaData(
-                bind=self.db_connection), autoload=True)
+        from dimension_cache import DimensionCache
+        from warehouse_schema import dim_estacion, dim_periodo, dim_region, fact_temprec, fact_temprec_diaria
 
+        # Los errores de conexión no se ocultan: sin base de datos no hay carga posible
+        db_engine = None
+        try:
+            db_engine = self.load_backend.create_engine(self.pool_size)
+            self.load_backend.prepare(db_engine)
+            with db_engine.connect():
+                print('Conexión a la base de datos exitosa!')
         except Exception as exception:
-            self.db_connection = None
-            print('Error al autenticarse con la base de datos.', exception)
+            print('Error al conectarse con la base de datos.', exception)
+            if (db_engine is not None):
+                db_engine.dispose()
+            raise
+
+        self.db_engine = db_engine
+        self.metrics.watch_engine(self.db_engine)
+
+        # Tablas declaradas en warehouse_schema.py a partir de create_database.sql, compartidas por todas
+        # las conexiones, sin reflejarlas desde la base de datos
+        self.fact_table = fact_temprec
+        self.period_table = dim_periodo
+        self.station_table = dim_estacion
+        self.region_table = dim_region
+        self.daily_fact_table = fact_temprec_diaria
+
+        # Cachés clave natural -> ID compartidas entre la carga de dimensiones y la de hechos. Los miembros
+        # se insertan ignorando las llaves naturales que ya existen, para repetir la carga sin duplicarlos
+        insert_members = functools.partial(self.load_backend.insert_rows, ignore_duplicates=True)
+        self.region_cache = DimensionCache(
+            self.region_table, 'ID_REGION', {'NOMBRE_REGION': 'region'}, insert_rows=insert_members)
+        self.station_cache = DimensionCache(self.station_table, 'ID_ESTACION', {'NOMBRE': 'estacion'}, {
+            'LATITUD': 'latitud', 'ALTITUD': 'altitud'}, insert_rows=insert_members)
+        self.period_cache = DimensionCache(
+            self.period_table, 'ID_PERIODO', {'MES': 'mes', 'ANNIO': 'año'}, insert_rows=insert_members)
 
     def __load_regions(self):
-        unique_regions = self.joined_dataframes['region'].unique()
+        with self.metrics.stage('load.dim_region') as stage, self.db_engine.begin() as connection:
+            self.region_cache.load(connection)
+            created_regions = self.region_cache.ensure(
+                connection, self.station_attributes)
+            stage['rows_out'] = created_regions
+        print('dim_region: %s regiones nuevas, %s en caché.' % (created_regions, len(self.region_cache.keys)))
 
-        print('Poblando dim_region...')
-        for region in unique_regions:
-            insert_region = (
-                insert(self.region_table).
-                values(NOMBRE_REGION=region)
-            )
+    def __load_stations(self):
+        with self.metrics.stage('load.dim_estacion') as stage, self.db_engine.begin() as connection:
+            self.station_cache.load(connection)
+            created_stations = self.station_cache.ensure(
+                connection, self.station_catalog.reference_coordinates(self.station_attributes))
+            stage['rows_out'] = created_stations
+        print('dim_estacion: %s estaciones nuevas, %s en caché.' % (created_stations, len(self.station_cache.keys)))
 
-            self.db_connection.execute(insert_region)
+    def __load_periods(self):
+        with self.metrics.stage('load.dim_periodo') as stage, self.db_engine.begin() as connection:
+            self.period_cache.load(connection)
+            created_periods = self.period_cache.ensure(
+                connection, self.grouped_data[['mes', 'año']].droplevel(1, axis=1))
+            stage['rows_out'] = created_periods
+        print('dim_periodo: %s periodos nuevos, %s en caché.' % (created_periods, len(self.period_cache.keys)))
 
-    def __load_stations(self):
-        stations_to_create = []
+    def __load_fact_table(self):
+        print('Poblando tabla de hechos fact_temprec...')
+        start_time = time.time()
 
-        unique_stations = self.joined_dataframes['estacion'].unique()
+        # Aplanar las columnas agregadas y adjuntar las llaves sustitutas
+        facts, dropped_facts = self.__attach_surrogate_keys(pandas.DataFrame({
+            column: self.grouped_data[aggregate].values for aggregate, column in fact_columns_map.items()}))
 
-        for station in unique_stations:
-            out = self.joined_dataframes.loc[self.joined_dataframes['estacion'] == station, [
-                'estacion', 'latitud', 'altitud']]
-            stations_to_create.append(
-                out.drop_duplicates(['estacion']).values[0])
+        records = facts[fact_table_columns].to_dict('records')
 
-        print('Poblando dim_estacion...')
-        for station in stations_to_create:
-            nombre_estacion, latitud, altitud = station
+        self.loaded_period_ids = {record['ID_PERIODO'] for record in records}
 
-            insert_station = (
-                insert(self.station_table).
-                values(NOMBRE=nombre_estacion,
-                       LATITUD=latitud, ALTITUD=altitud)
-            )
+        inserted_records, shards, skipped_shards = self.__load_shards(records, self.__insert_fact_batch, 'fact_temprec')
 
-            self.db_connection.execute(insert_station)
+        execution_time = time.time() - start_time
+        print('%s hechos insertados en %s fragmentos en %s segundos (%.0f filas/s).' % (
+            inserted_records, shards, execution_time, inserted_records / execution_time if execution_time else 0))
+        if (skipped_shards):
+            print('%s fragmentos de fact_temprec ya confirmados en la ejecución que se reanuda, se omitieron.' % (skipped_shards))
 
-    def __load_periods(self):
-        periods_to_create = self.grouped_data[['mes', 'año']].values
-        print('Poblando dim_periodo...')
+        if (len(dropped_facts)):
+            print('%s filas descartadas por llaves faltantes (estaciones: %s).' % (
+                len(dropped_facts), ', '.join(dropped_facts['estacion'].unique())))
 
-        for month, year in periods_to_create:
-            select_period = select(self.period_table).where(
-                self.period_table.c.MES == month, self.period_table.c.ANNIO == year)
+        return inserted_records
 
-            period = self.db_connection.execute(select_period).first()
+    def __attach_surrogate_keys(self, dataframe):
+        # Las llaves sustitutas ya están resueltas en los mapas de la caché de dimensiones y se adjuntan
+        # de forma vectorizada. Devuelve las filas con sus llaves y las descartadas por llaves faltantes
+        stations = self.station_cache.frame('id_estacion')
+        periods = self.period_cache.frame('id_periodo')
+        regions = self.region_cache.frame('id_region')
 
+        station_regions_map = self.station_attributes[['estacion', 'region']]
 
-            if (not period):
-                insert_period = (
-                    insert(self.period_table).
-                    values(ANNIO=year,
-                        MES=month)
-                )
+        dataframe = dataframe.merge(station_regions_map, on='estacion', how='left')
+        dataframe = dataframe.merge(stations, on='estacion', how='left')
+        dataframe = dataframe.merge(periods, on=['mes', 'año'], how='left')
+        dataframe = dataframe.merge(regions, on='region', how='left')
 
-                self.db_connection.execute(insert_period)
+        missing_keys = dataframe[['id_estacion', 'id_periodo', 'id_region']].isna().any(axis=1)
 
-    def __load_fact_table(self):
-        station_regions_map = self.joined_dataframes.groupby(
-            ['estacion'], as_index=False).agg({'region': ['min']})
+        return dataframe.loc[~missing_keys].rename(columns={
+            'id_estacion': 'ID_ESTACION', 'id_periodo': 'ID_PERIODO', 'id_region': 'ID_REGION'}).astype({
+            'ID_ESTACION': int, 'ID_PERIODO': int, 'ID_REGION': int}), dataframe.loc[missing_keys]
 
-        print('Poblando tabla de hechos fact_temprec...')
-        for row in self.grouped_data.values:
-            nombre_estacion, month, year, promedio_temperatura_minima, minima_temperatura_minima, maxima_temperatura_minima, promedio_temperatura_maxima, minima_temperatura_maxima, maxima_temperatura_maxima, promedio_precipitacion, minima_precipitacion, maxima_precipitacion, suma_precipitacion = row
-            region_estacion = station_regions_map.loc[station_regions_map['estacion']
-                                                      == nombre_estacion, 'region'].values[0][0]
-
-            select_station = select(self.station_table).where(
-                self.station_table.c.NOMBRE == nombre_estacion)
-            select_period = select(self.period_table).where(
-                self.period_table.c.MES == month, self.period_table.c.ANNIO == year)
-            select_region = select(self.region_table).where(
-                self.region_table.c.NOMBRE_REGION == region_estacion)
-
-            station = self.db_connection.execute(select_station).first()
-            region = self.db_connection.execute(select_region).first()
-            period = self.db_connection.execute(select_period).first()
-
-            if (not station or not region or not period):
-                continue
-
-            id_estacion = station[0]
-            id_periodo = period[0]
-            id_region = region[0]
-
-            insert_period = (
-                insert(self.fact_table).
-                values(
-                    ID_PERIODO=id_periodo,
-                    ID_ESTACION=id_estacion,
-                    ID_REGION=id_region,
-                    MINIMA_TEMPERATURA_MAXIMA=minima_temperatura_maxima,
-                    MAXIMA_TEMPERATURA_MAXIMA=maxima_temperatura_maxima,
-                    MINIMA_TEMPERATURA_MINIMA=minima_temperatura_minima,
-                    MAXIMA_TEMPERATURA_MINIMA=maxima_temperatura_minima,
-                    PROMEDIO_TEMPERATURA_MINIMA=promedio_temperatura_minima,
-                    PROMEDIO_TEMPERATURA_MAXIMA=promedio_temperatura_maxima,
-                    PROMEDIO_PRECIPITACION=promedio_precipitacion,
-                    PRECIPITACION_MINIMA=minima_precipitacion,
-                    PRECIPITACION_MAXIMA=maxima_precipitacion,
-                    SUMA_PRECIPITACION=suma_precipitacion)
-                )
-
-            self.db_connection.execute(insert_period)
-
-    def __clean_station_names(self):
-        # Corregir nombres de estaciones provenientes del CSV de temperaturas
-        self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"] ==
-                                        "Eulogio SÃ¡nchez, Tobalaba Ad.", "estacion"] = "Eulogio Sánchez, Tobalaba Ad."
-        self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"] ==
-                                        "Juan FernÃ¡ndez, EstaciÃ³n MeteorolÃ³gica.", "estacion"] = "Juan Fernández, Estación Meteorológica."
-        self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"] ==
-                                        "General Freire, CuricÃ³ Ad.", "estacion"] = "General Freire, Curicó Ad."
-        self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"] ==
-                                        "General Bernardo O'Higgins, ChillÃ¡n Ad.", "estacion"] = "General Bernardo O'Higgins, Chillán Ad."
-        self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"] ==
-                                        "Carriel Sur, ConcepciÃ³n Ap.", "estacion"] = "Carriel Sur, Concepción Ap."
-        self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"] ==
-                                        "MarÃ\xada Dolores, Los Angeles Ad.", "estacion"] = "María Dolores, Los Angeles Ad."
-        self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                        == "CaÃ±al Bajo,  Osorno Ad.", "estacion"] = "Cañal Bajo, Osorno Ad."
-        self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                        == "FutaleufÃº Ad.", "estacion"] = "Futaleufú Ad."
-        self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                        == "Puerto AysÃ©n Ad.", "estacion"] = "Puerto Aysén Ad."
-        self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"] ==
-                                        "Carlos IbaÃ±ez, Punta Arenas Ap.", "estacion"] = "Carlos Ibañez, Punta Arenas Ap."
-        self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"] ==
-                                        "Fuentes MartÃ\xadnez, Porvenir Ad.", "estacion"] = "Fuentes Martínez, Porvenir Ad."
-        self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"] ==
-                                        "Guardiamarina ZaÃ±artu, Pto Williams Ad.", "estacion"] = "Guardiamarina Zañartu, Pto Williams Ad."
-        self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"] ==
-                                        "C.M.A. Eduardo Frei Montalva, AntÃ¡rtica ", "estacion"] = "C.M.A. Eduardo Frei Montalva, Antártica."
-        self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"] ==
-                                        "EulÃ³gio SÃ¡nchez, Tobalaba Ad.", "estacion"] = "Eulogio Sánchez, Tobalaba Ad."
-        self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                        == "Carriel Sur, ConcepciÃ³n.", "estacion"] = "Carriel Sur, Concepción."
-        self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"] ==
-                                        "Guardia Marina ZaÃ±artu, Pto Williams Ad.", "estacion"] = "Guardiamarina Zañartu, Pto Williams Ad."
-        self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"] ==
-                                        "Desierto de Atacama, Caldera  Ad.", "estacion"] = "Desierto de Atacama, Caldera Ad."
-        self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"] ==
-                                        "Cerro Moreno  Antofagasta  Ap.", "estacion"] = "Cerro Moreno Antofagasta Ap."
-        self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"] ==
-                                        "Mataveri  Isla de Pascua Ap.", "estacion"] = "Mataveri Isla de Pascua Ap."
-        self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                        == "Pudahuel Santiago ", "estacion"] = "Pudahuel Santiago"
-
-        # Corregir nombres de estaciones provenientes del CSV de precipitaciones
-        self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                           == "  Osorno Ad.", "estacion"] = "Cañal Bajo, Osorno Ad."
-        self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                           == " Ad.", "estacion"] = "Ad."
-        self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                           == " AntÃ¡rtica ", "estacion"] = "C.M.A. Eduardo Frei Montalva, Antártica."
-        self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                           == " Arica Ap.", "estacion"] = "Arica Ap."
-        self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                           == " Calama Ad.", "estacion"] = "Calama Ad."
-        self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                           == " Caldera  Ad.", "estacion"] = "Desierto de Atacama, Caldera Ad."
-        self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                           == " ChillÃ¡n Ad.", "estacion"] = "General Bernardo O'Higgins, Chillán Ad."
-        self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                           == " ConcepciÃ³n Ap.", "estacion"] = "Carriel Sur, Concepción Ap."
-        self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                           == " ConcepciÃ³n.", "estacion"] = "Carriel Sur, Concepción."
-        self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                           == " CuricÃ³ Ad.", "estacion"] = "General Freire, Curicó Ad."
-        self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"] ==
-                                           " EstaciÃ³n MeteorolÃ³gica.", "estacion"] = "Juan Fernández, Estación Meteorológica."
-        self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                           == " La Serena Ad.", "estacion"] = "La Florida, La Serena Ad."
-        self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                           == " Los Angeles Ad.", "estacion"] = "María Dolores, Los Angeles Ad."
-        self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                           == " Porvenir Ad.", "estacion"] = "Fuentes Martínez, Porvenir Ad."
-        self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"] ==
-                                           " Pto Williams Ad.", "estacion"] = "Guardiamarina Zañartu, Pto Williams Ad."
-        self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                           == " Punta Arenas Ap.", "estacion"] = "Carlos Ibañez, Punta Arenas Ap."
-        self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                           == " Temuco Ad.", "estacion"] = "Temuco Ad."
-        self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                           == " Tobalaba Ad.", "estacion"] = "Eulogio Sánchez, Tobalaba Ad."
-        self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"] ==
-                                           " Puerto Natales Ad.", "estacion"] = "Teniente Gallardo, Puerto Natales Ad."
-        self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                           == "Arica Ap.", "estacion"] = "Chacalluta, Arica Ap."
-        self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                           == " Valdivia Ad.", "estacion"] = "Pichoy, Valdivia Ad."
-        self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                           == " Santiago", "estacion"] = "Pudahuel Santiago"
-        self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                           == "Calama Ad.", "estacion"] = "El Loa, Calama Ad."
-        self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                           == "Temuco Ad.", "estacion"] = "Maquehue, Temuco Ad."
-        self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                           == "Coyahique Ad.", "estacion"] = "Teniente Vidal, Coyhaique Ad."
-
-    def __add_regions(self):
-        for estacion in self.dataframe_precipitaciones["estacion"].unique():
-            if (estacion == 'Cañal Bajo, Osorno Ad.'):
-                self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                                   == estacion, "region"] = "Los Lagos"
-            elif (estacion == "Ad."):
-                self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                                   == estacion, "region"] = "Metropolitana"
-            elif (estacion == "C.M.A. Eduardo Frei Montalva, Antártica."):
-                self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                                   == estacion, "region"] = "Magallanes y Antártica Chilena"
-            elif (estacion == "Chacalluta, Arica Ap."):
-                self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                                   == estacion, "region"] = "Arica y Parinacota"
-            elif (estacion == "El Loa, Calama Ad."):
-                self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                                   == estacion, "region"] = "Antofagasta"
-            elif (estacion == "Desierto de Atacama, Caldera Ad."):
-                self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                                   == estacion, "region"] = "Atacama"
-            elif (estacion == "General Bernardo O'Higgins, Chillán Ad."):
-                self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                                   == estacion, "region"] = "Ñuble"
-            elif (estacion == "Carriel Sur, Concepción Ap."):
-                self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                                   == estacion, "region"] = "Bío Bío"
-            elif (estacion == "Carriel Sur, Concepción."):
-                self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                                   == estacion, "region"] = "Bío Bío"
-            elif (estacion == "Teniente Vidal, Coyhaique Ad."):
-                self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                                   == estacion, "region"] = "Aysén"
-            elif (estacion == "General Freire, Curicó Ad."):
-                self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                                   == estacion, "region"] = "Maule"
-            elif (estacion == "Juan Fernández, Estación Meteorológica."):
-                self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                                   == estacion, "region"] = "Valparaíso"
-            elif (estacion == "La Florida, La Serena Ad."):
-                self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                                   == estacion, "region"] = "Coquimbo"
-            elif (estacion == "María Dolores, Los Angeles Ad."):
-                self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                                   == estacion, "region"] = "Bío Bío"
-            elif (estacion == "Fuentes Martínez, Porvenir Ad."):
-                self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                                   == estacion, "region"] = "Magallanes y Antártica Chilena"
-            elif (estacion == "Guardiamarina Zañartu, Pto Williams Ad."):
-                self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                                   == estacion, "region"] = "Magallanes y Antártica Chilena"
-            elif (estacion == "Teniente Gallardo, Puerto Natales Ad."):
-                self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                                   == estacion, "region"] = "Magallanes y Antártica Chilena"
-            elif (estacion == "Carlos Ibañez, Punta Arenas Ap."):
-                self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                                   == estacion, "region"] = "Magallanes y Antártica Chilena"
-            elif (estacion == "Pudahuel Santiago"):
-                self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                                   == estacion, "region"] = "Metropolitana"
-            elif (estacion == "Maquehue, Temuco Ad."):
-                self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                                   == estacion, "region"] = "Araucanía"
-            elif (estacion == "Eulogio Sánchez, Tobalaba Ad."):
-                self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                                   == estacion, "region"] = "Metropolitana"
-            elif (estacion == "Pichoy, Valdivia Ad."):
-                self.dataframe_precipitaciones.loc[self.dataframe_precipitaciones["estacion"]
-                                                   == estacion, "region"] = "Los Ríos"
-
-        for estacion in self.dataframe_temperaturas["estacion"].unique():
-            if (estacion == 'Chacalluta, Arica Ap.'):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Arica y Parinacota"
-            elif (estacion == 'Diego Aracena Iquique Ap.'):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Tarapacá"
-            elif (estacion == 'El Loa, Calama Ad.'):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Antofagasta"
-            elif (estacion == 'Cerro Moreno Antofagasta Ap.'):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Antofagasta"
-            elif (estacion == 'Mataveri Isla de Pascua Ap.'):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Valparaíso"
-            elif (estacion == 'Desierto de Atacama, Caldera Ad.'):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Atacama"
-            elif (estacion == 'La Florida, La Serena Ad.'):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Coquimbo"
-            elif (estacion == 'Rodelillo, Ad.'):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Valparaíso"
-            elif (estacion == 'Eulogio Sánchez, Tobalaba Ad.'):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Metropolitana"
-            elif (estacion == 'Quinta Normal, Santiago'):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Metropolitana"
-            elif (estacion == 'Pudahuel Santiago'):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Metropolitana"
-            elif (estacion == 'Santo Domingo, Ad.'):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Valparaíso"
-            elif (estacion == 'Juan Fernández, Estación Meteorológica.'):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Valparaíso"
-            elif (estacion == 'General Freire, Curicó Ad.'):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Maule"
-            elif (estacion == "General Bernardo O'Higgins, Chillán Ad."):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Ñuble"
-            elif (estacion == "Carriel Sur, Concepción Ap."):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Bío Bío"
-            elif (estacion == "María Dolores, Los Angeles Ad."):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Bío Bío"
-            elif (estacion == "Maquehue, Temuco Ad."):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Araucanía"
-            elif (estacion == "Pichoy, Valdivia Ad."):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Los Ríos"
-            elif (estacion == "Cañal Bajo, Osorno Ad."):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Los Lagos"
-            elif (estacion == "El Tepual Puerto Montt Ap."):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Los Lagos"
-            elif (estacion == "Futalfefú Ad."):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Los Lagos"
-            elif (estacion == "Alto Palena Ad."):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Los Lagos"
-            elif (estacion == "Puerto Aysén Ad."):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Aysén"
-            elif (estacion == "Teniente Vidal, Coyhaique Ad."):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Aysén"
-            elif (estacion == "Balmaceda Ad."):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Aysén"
-            elif (estacion == "Chile Chico Ad."):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Aysén"
-            elif (estacion == "Lord Cochrane Ad."):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Aysén"
-            elif (estacion == "Teniente Gallardo, Puerto Natales Ad."):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Magallanes y Antártica Chilena"
-            elif (estacion == "Carlos Ibañez, Punta Arenas Ap."):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Magallanes y Antártica Chilena"
-            elif (estacion == "Fuentes Martínez, Porvenir Ad."):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Magallanes y Antártica Chilena"
-            elif (estacion == "Guardiamarina Zañartu, Pto Williams Ad."):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Magallanes y Antártica Chilena"
-            elif (estacion == "C.M.A. Eduardo Frei Montalva, Antártica."):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Magallanes y Antártica Chilena"
-            elif (estacion == "Carriel Sur, Concepción."):
-                self.dataframe_temperaturas.loc[self.dataframe_temperaturas["estacion"]
-                                                == estacion, "region"] = "Bío Bío"
+    def __load_daily_fact_table(self):
+        from daily_facts import daily_fact_columns_map, daily_fact_table_columns, delete_daily_facts
+
+        print('Poblando tabla de hechos diarios fact_temprec_diaria...')
+        start_time = time.time()
+
+        daily_facts, dropped_facts = self.__attach_surrogate_keys(
+            self.joined_dataframes[['estacion', *daily_fact_columns_map]])
+        daily_facts = daily_facts.rename(columns=daily_fact_columns_map)
+
+        self.loaded_period_ids = set(daily_facts['ID_PERIODO'].unique().tolist())
+        self.loaded_years = set(daily_facts['ANNIO'].unique().tolist())
+
+        # Crear las particiones de los años nuevos y borrar las observaciones de los grupos que se
+        # vuelven a cargar antes de insertar en paralelo
+        groups = list(daily_facts[['ID_ESTACION', 'ID_PERIODO', 'ANNIO']].drop_duplicates().itertuples(
+            index=False, name=None))
+        with self.db_engine.begin() as connection:
+            new_partitions = self.load_backend.add_year_partitions(
+                connection, self.daily_fact_table, self.loaded_years)
+        # El borrado se registra como lote: al reanudar no debe borrar los fragmentos ya confirmados
+        if (not self.__committed_batches('fact_temprec_diaria.borrado')):
+            with self.db_engine.begin() as connection:
+                for batch_start in range(0, len(groups), self.fact_batch_size):
+                    delete_daily_facts(connection, groups[batch_start:batch_start + self.fact_batch_size])
+                record_batch(connection, self.checkpoint.run_id, 'fact_temprec_diaria.borrado', 0)
+
+        if (new_partitions):
+            print('fact_temprec_diaria: particiones nuevas %s.' % (', '.join(new_partitions)))
+
+        records = daily_facts[daily_fact_table_columns].to_dict('records')
+        inserted_records, shards, skipped_shards = self.__load_shards(records, self.__insert_daily_fact_batch, 'fact_temprec_diaria')
+
+        execution_time = time.time() - start_time
+        print('%s hechos diarios insertados en %s fragmentos en %s segundos (%.0f filas/s).' % (
+            inserted_records, shards, execution_time, inserted_records / execution_time if execution_time else 0))
+        if (skipped_shards):
+            print('%s fragmentos de fact_temprec_diaria ya confirmados en la ejecución que se reanuda, se omitieron.' % (skipped_shards))
+
+        if (len(dropped_facts)):
+            print('%s observaciones descartadas por llaves faltantes (estaciones: %s).' % (
+                len(dropped_facts), ', '.join(dropped_facts['estacion'].astype('object').unique())))
+
+        return inserted_records
+
+    def __derive_fact_table(self):
+        from daily_facts import derive_monthly_facts
+
+        # Hechos mensuales de los periodos cargados, calculados en la base de datos desde los diarios
+        if (self.__committed_batches('fact_temprec.derivados')):
+            print('Hechos mensuales ya derivados en la ejecución que se reanuda.')
+            return 0
+
+        start_time = time.time()
+        with self.db_engine.begin() as connection:
+            derived_facts = derive_monthly_facts(connection, self.loaded_period_ids, self.loaded_years)
+            record_batch(connection, self.checkpoint.run_id, 'fact_temprec.derivados', 0)
+
+        print('%s hechos derivados de fact_temprec_diaria en %s segundos.' % (derived_facts, time.time() - start_time))
+
+        return derived_facts
+
+    def drop_daily_facts_before(self, year):
+        # Eliminar las observaciones diarias anteriores a year; los hechos mensuales y los rollups se conservan
+        self.__connect_database()
+        with self.db_engine.begin() as connection:
+            dropped_partitions = self.load_backend.drop_year_partitions(connection, self.daily_fact_table, year)
+
+        if (dropped_partitions):
+            print('fact_temprec_diaria: particiones eliminadas %s.' % (', '.join(dropped_partitions)))
@@ -0,0 +1,177 @@
+import numpy
+import pandas
+
+group_columns = ['estacion', 'mes', 'año']
+
+# Agregados de grouped_data por medida, en el orden de sus columnas
+aggregations = {
+    'temperatura_minima': ['mean', 'min', 'max', 'sum'],
+    'temperatura_maxima': ['mean', 'min', 'max', 'sum'],
+    'precipitacion': ['mean', 'min', 'max', 'sum', 'count'],
+}
+
+# Componentes aditivos que permiten combinar agregados parciales de forma exacta
+partial_aggregations = {
+    **{(measure, component): 'sum' for measure in aggregations for component in ('sum', 'count')},
+    **{(measure, component): component for measure in aggregations for component in ('min', 'max')},
+    ('fecha', 'max'): 'max',
+}
+
+
+def observation_dates(dataframe):
+    # Fecha de cada observación como entero AAAAMMDD
+    return dataframe['año'].astype('int64') * 10000 + dataframe['mes'].astype('int64') * 100 + dataframe['dia'].astype('int64')
+
+
+def aggregate_observations(joined_dataframes):
+    # Mismos valores que groupby(group_columns, as_index=False, observed=True).agg(aggregations) en una
+    # sola pasada de NumPy: las filas se ordenan por una llave entera (estación, mes, año) y cada agregado
+    # se calcula con reduceat sobre los tramos de cada grupo. Los grupos quedan ordenados por el código de
+    # la estación (el orden de sus categorías, o alfabético si no es categórica), mes y año; ese orden
+    # es el definido aquí y no depende del que produzca groupby (tests/test_aggregation.py)
+    station_codes, stations = group_codes(joined_dataframes['estacion'])
+    months = joined_dataframes['mes'].to_numpy()
+    years = joined_dataframes['año'].to_numpy()
+
+    # Las filas sin estación no forman grupo, igual que en groupby
+    rows = numpy.flatnonzero(station_codes >= 0)
+    keys = station_codes[rows] * 1000000 + months[rows].astype('int64') * 10000 + years[rows].astype('int64')
+    key_order = numpy.argsort(keys, kind='stable')
+    order = rows[key_order]
+    sorted_keys = keys[key_order]
+    starts = numpy.flatnonzero(numpy.append(True, sorted_keys[1:] != sorted_keys[:-1])) if len(
+        sorted_keys) else numpy.array([], dtype='int64')
+    first_rows = order[starts]
+
+    if (isinstance(stations, pandas.CategoricalDtype)):
+        group_stations = pandas.Categorical.from_codes(station_codes[first_rows], dtype=stations)
+    else:
+        group_stations = stations[station_codes[first_rows]]
+
+    grouped_data = pandas.DataFrame({
+        ('estacion', ''): group_stations, ('mes', ''): months[first_rows], ('año', ''): years[first_rows]})
+
+    # Las medidas se reducen juntas, como columnas de una sola matriz
+    measures = list(aggregations)
+    values = numpy.column_stack([joined_dataframes[measure].to_numpy() for measure in measures])[order]
+    results = group_reductions(values, starts, set().union(*aggregations.values()))
+
+    for column, measure in enumerate(measures):
+        for function in aggregations[measure]:
+            grouped_data[(measure, function)] = results[function][:, column]
+
+    return grouped_data
+
+
+def group_codes(column):
+    # Código entero por fila (-1 si falta) y sus valores, en el orden en que groupby ordena los grupos
+    if (isinstance(column.dtype, pandas.CategoricalDtype)):
+        return column.cat.codes.to_numpy().astype('int64'), column.dtype
+
+    codes, uniques = pandas.factorize(column, sort=True)
+    return codes.astype('int64'), numpy.asarray(uniques, dtype='object')
+
+
+def group_reductions(values, starts, functions):
+    # Agregados por columna de los tramos [starts[i], starts[i + 1]) de values, ignorando NaN como pandas
+    if (not len(starts)):
+        return {function: numpy.empty((0, values.shape[1]), dtype='int64' if function == 'count' else values.dtype)
+                for function in functions}
+
+    sums, counts = compensated_sums(values, starts)
+
+    results = {}
+    for function in functions:
+        if (function == 'count'):
+            results[function] = counts
+        elif (function == 'sum'):
+            results[function] = sums
+        elif (function == 'mean'):
+            with numpy.errstate(invalid='ignore', divide='ignore'):
+                results[function] = sums / counts.astype(values.dtype)
+        elif (function == 'min'):
+            results[function] = numpy.fmin.reduceat(values, starts)
+        elif (function == 'max'):
+            results[function] = numpy.fmax.reduceat(values, starts)
+
+    return results
+
+
+def compensated_sums(values, starts):
+    # Suma de Kahan por grupo en el tipo de los valores, la misma que usa groupby, para obtener
+    # exactamente sus sumas y promedios. Se avanza una posición de todos los grupos a la vez (unas 31
+    # iteraciones para grupos mensuales); con los grupos ordenados de mayor a menor largo, los que
+    # siguen activos en cada posición son siempre un prefijo y se actualizan sobre vistas
+    lengths = numpy.diff(numpy.append(starts, len(values)))
+    by_length = numpy.argsort(-lengths, kind='stable')
+    group_starts = starts[by_length]
+    active_groups = numpy.searchsorted(-lengths[by_length], -numpy.arange(lengths.max()), side='left')
+
+    sums = numpy.zeros((len(starts), values.shape[1]), dtype=values.dtype)
+    compensations = numpy.zeros_like(sums)
+    counts = numpy.zeros(sums.shape, dtype='int64')
+
+    for position, active in enumerate(active_groups):
+        group_values = values[group_starts[:active] + position]
+        valid = ~numpy.isnan(group_values)
+
+        group_sums = sums[:active]
+        y = group_values - compensations[:active]
+        t = group_sums + y
+        numpy.copyto(compensations[:active], (t - group_sums) - y, where=valid)
+        numpy.copyto(group_sums, t, where=valid)
+        counts[:active] += valid
+
+    # Volver al orden de los grupos
+    group_order = numpy.empty_like(by_length)
+    group_order[by_length] = numpy.arange(len(by_length))
+
+    return sums[group_order], counts[group_order]
+
+
+def partial_aggregates(joined_dataframes):
+    partial = joined_dataframes.assign(fecha=observation_dates(joined_dataframes)).groupby(
+        group_columns, observed=True).agg({
+            **{measure: ['sum', 'count', 'min', 'max'] for measure in aggregations}, 'fecha': ['max']})
+
+    return partial[list(partial_aggregations)]
+
+
+def combine_partial_aggregates(accumulated, partial):
+    if (accumulated is None):
+        return partial
+
+    # observed=True: la estación es categórica y sin él se agregan también las combinaciones sin filas
+    return pandas.concat([accumulated, partial]).groupby(level=group_columns, observed=True).agg(partial_aggregations)
+
+
+def finalize_aggregates(accumulated):
+    # Reconstruir grouped_data (mismas columnas y orden) a partir de los componentes acumulados
+    grouped_data = pandas.DataFrame({
+        (column, ''): accumulated.index.get_level_values(column) for column in group_columns})
+
+    for measure, functions in aggregations.items():
+        for function in functions:
+            if (function == 'mean'):
+                values = accumulated[(measure, 'sum')] / accumulated[(measure, 'count')]
+            else:
+                values = accumulated[(measure, function)]
+
+            grouped_data[(measure, function)] = values.values
+
+    return grouped_data
+
+
+def station_attributes(joined_dataframes):
+    # Coordenadas de la primera observación, región y última fecha cargada de cada estación
+    return joined_dataframes.assign(fecha=observation_dates(joined_dataframes)).groupby(
+        'estacion', as_index=False, sort=False, observed=True).agg(
+            latitud=('latitud', 'first'), altitud=('altitud', 'first'), region=('region', 'first'), fecha=('fecha', 'max'))
+
+
+def combine_station_attributes(accumulated, attributes):
+    if (accumulated is None):
+        return attributes
+
+    return pandas.concat([accumulated, attributes]).groupby('estacion', as_index=False, sort=False).agg(
+        latitud=('latitud', 'first'), altitud=('altitud', 'first'), region=('region', 'first'), fecha=('fecha', 'max'))
@@ -0,0 +1,40 @@
+# Microbenchmark: parseo de latitudes con apply por fila vs. parse_coordinates sobre valores distintos
+import sys
+import timeit
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.realpath(__file__))))
+
+from coordinates import parse_coordinates  # noqa: E402
+from ETL_meteorologioco import transform_coords  # noqa: E402
+import pandas  # noqa: E402
+
+repetitions = 5
+
+
+def apply_path(latitudes):
+    latitudes = latitudes.apply(lambda x: x.replace('&deg', '°'))
+    return latitudes.apply(lambda x: transform_coords(x))
+
+
+def main():
+    csv_path = path.join(path.dirname(path.dirname(
+        path.realpath(__file__))), 'data', 'precipitaciones.csv')
+    latitudes = pandas.read_csv(
+        csv_path, encoding='latin-1', delimiter=';')['latitud']
+
+    # Ambos caminos deben entregar exactamente los mismos valores
+    pandas.testing.assert_series_equal(
+        apply_path(latitudes), parse_coordinates(latitudes), check_exact=True)
+
+    print('%s filas, %s latitudes distintas' %
+          (len(latitudes), latitudes.nunique()))
+    for name, function in (('apply', apply_path), ('parse_coordinates', parse_coordinates)):
+        best_time = min(timeit.repeat(
+            lambda: function(latitudes), number=1, repeat=repetitions))
+        print('%-18s %8.2f ms (mejor de %s)' %
+              (name, best_time * 1000, repetitions))
+
+
+if __name__ == '__main__':
+    main()
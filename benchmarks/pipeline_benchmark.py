@@ -0,0 +1,153 @@
+# Benchmark del ETL completo sobre datos sintéticos: mide extract, transform y load por separado en
+# varias escalas contra una base SQLite local y guarda los resultados en JSON para compararlos
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.realpath(__file__))))
+
+from ETL_meteorologioco import ETLMeteorologico  # noqa: E402
+from load_backends import SQLiteLoadBackend  # noqa: E402
+from synthetic_data import generate, parse_scale  # noqa: E402
+import pandas  # noqa: E402
+
+default_scales = ['5x2x28', '20x5x31', '40x10x31']
+
+default_results_path = path.join(path.dirname(path.realpath(__file__)), 'results')
+
+# Etapas que se comparan entre ejecuciones; el resto se guarda igual en el JSON
+summary_stages = ['extract', 'transform', 'load']
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=path.dirname(path.realpath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_pipeline(files, work_dir, options):
+    # Base de datos y marcas de agua nuevas y sin manifiesto de archivos en cada repetición, para medir
+    # siempre una carga completa
+    database_path = path.join(work_dir, 'warehouse.sqlite')
+    if (path.exists(database_path)):
+        os.remove(database_path)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        etl = ETLMeteorologico([files['precipitaciones'], files['temperaturas']],
+                               backend=SQLiteLoadBackend(database_path), station_catalog_path=files['estaciones'],
+                               watermark_directory=path.join(work_dir, 'watermarks-%s' % (time.time_ns())),
+                               metrics_path=None, quarantine_path=path.join(work_dir, 'cuarentena'),
+                               checkpoint_path=path.join(work_dir, 'checkpoint'), manifest_directory=None, **options)
+        etl.run()
+
+    stages = {record['stage']: record for record in etl.metrics.stages}
+    del etl
+    return stages
+
+
+def benchmark_scale(scale, repeat, seed, options):
+    stations, years, days = parse_scale(scale)
+
+    with tempfile.TemporaryDirectory(prefix='etl-benchmark-') as work_dir:
+        files, rows = generate(work_dir, stations, years, days, seed)
+
+        # Por etapa se conserva la repetición más rápida
+        best_stages = {}
+        for _ in range(repeat):
+            for name, record in run_pipeline(files, work_dir, options).items():
+                if (name not in best_stages or record['wall_s'] < best_stages[name]['wall_s']):
+                    best_stages[name] = {key: value for key, value in record.items() if key not in ('run_id', 'stage')}
+
+    return {'scale': scale, 'stations': stations, 'years': years, 'days': days, 'rows': rows, 'stages': best_stages}
+
+
+def compare(results, baseline, threshold):
+    # Razón tiempo actual / tiempo base por escala y etapa; sobre 1 + threshold es una regresión
+    baseline_scales = {scale_result['scale']: scale_result for scale_result in baseline['scales']}
+    regressions = 0
+
+    print('%-12s %-10s %10s %10s %8s' % ('escala', 'etapa', 'base (s)', 'actual (s)', 'razón'))
+    for scale_result in results['scales']:
+        baseline_result = baseline_scales.get(scale_result['scale'])
+        if (baseline_result is None):
+            continue
+
+        for stage in summary_stages:
+            if (stage not in scale_result['stages'] or stage not in baseline_result['stages']):
+                continue
+
+            current_time = scale_result['stages'][stage]['wall_s']
+            baseline_time = baseline_result['stages'][stage]['wall_s']
+            ratio = current_time / baseline_time if baseline_time else float('inf')
+            flag = ''
+            if (ratio > 1 + threshold):
+                flag = '  REGRESIÓN'
+                regressions += 1
+            elif (ratio < 1 - threshold):
+                flag = '  mejora'
+
+            print('%-12s %-10s %10.3f %10.3f %7.2fx%s' % (
+                scale_result['scale'], stage, baseline_time, current_time, ratio, flag))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del ETL sobre datos sintéticos')
+    parser.add_argument('--scale', action='append',
+                        help='estaciones x años x días por mes, repetible (por defecto %s)' % (', '.join(default_scales)))
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='repeticiones por escala, se conserva la más rápida')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--chunk-size', type=int)
+    parser.add_argument('--output', help='archivo JSON de resultados (por defecto benchmarks/results/<fecha>-<commit>.json)')
+    parser.add_argument('--compare', help='archivo JSON de una ejecución anterior con el que comparar')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='variación relativa sobre la que se informa una regresión o mejora')
+    arguments = parser.parse_args()
+
+    options = {'workers': arguments.workers, 'chunk_size': arguments.chunk_size}
+    results = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'pandas': pandas.__version__,
+        'platform': platform.platform(),
+        'options': {**options, 'repeat': arguments.repeat, 'seed': arguments.seed},
+        'scales': [],
+    }
+
+    for scale in arguments.scale or default_scales:
+        scale_result = benchmark_scale(scale, arguments.repeat, arguments.seed, options)
+        results['scales'].append(scale_result)
+        print('%s (%s filas de precipitación): %s' % (scale, scale_result['rows']['precipitaciones'], ', '.join(
+            '%s %.3f s' % (stage, scale_result['stages'][stage]['wall_s'])
+            for stage in summary_stages if stage in scale_result['stages'])))
+
+    output_path = arguments.output or path.join(default_results_path, '%s-%s.json' % (
+        time.strftime('%Y%m%dT%H%M%S'), results['revision'] or 'local'))
+    os.makedirs(path.dirname(path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as results_file:
+        json.dump(results, results_file, ensure_ascii=False, indent=2)
+    print('Resultados guardados en %s.' % (output_path))
+
+    if (arguments.compare):
+        with open(arguments.compare, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+        if (compare(results, baseline, arguments.threshold)):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+# Reporte de memoria: bytes por fila de cada CSV de origen leído sin esquema vs. con el esquema de schema.py
+import sys
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.realpath(__file__))))
+
+from schema import bytes_per_row, read_observations  # noqa: E402
+import pandas  # noqa: E402
+
+source_files = {
+    'precipitaciones': 'precipitaciones.csv',
+    'temperaturas': 'temperaturas.csv',
+}
+
+
+def main():
+    data_path = path.join(path.dirname(
+        path.dirname(path.realpath(__file__))), 'data')
+
+    for source_name, file_name in source_files.items():
+        file_path = path.join(data_path, file_name)
+        if (not path.exists(file_path)):
+            print('%s: no existe %s, se omite.' % (source_name, file_path))
+            continue
+
+        untyped = pandas.read_csv(file_path, encoding='latin-1', delimiter=';')
+        typed = read_observations(file_path, source_name)
+
+        print('%s (%s filas)' % (source_name, len(typed)))
+        print('  %-20s %16s %16s' % ('columna', 'sin esquema', 'con esquema'))
+        for column in typed.columns:
+            print('  %-20s %9.1f B/fila %9.1f B/fila' % (
+                column, bytes_per_row(untyped[[column]]), bytes_per_row(typed[[column]])))
+        print('  %-20s %9.1f B/fila %9.1f B/fila (%.1fx)' % (
+            'total', bytes_per_row(untyped), bytes_per_row(typed), bytes_per_row(untyped) / bytes_per_row(typed)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# Generador de datos meteorológicos sintéticos con el formato de los CSV reales: latin-1, ";" como
+# separador, latitudes con "&deg", nombres de estación mal codificados y temperatura_maxima con comas.
+# También escribe el catálogo de estaciones que normaliza esos nombres.
+import argparse
+import csv
+import os
+from os import path
+
+import numpy
+import pandas
+
+regions = ['Arica y Parinacota', 'Tarapacá', 'Antofagasta', 'Atacama', 'Coquimbo', 'Valparaíso', 'Metropolitana',
+           'Maule', 'Ñuble', 'Bío Bío', 'Araucanía', 'Los Ríos', 'Los Lagos', 'Aysén', 'Magallanes y Antártica Chilena']
+
+first_year = 2013
+
+
+def mis_encode(name):
+    # Texto UTF-8 leído como latin-1, como aparece en los CSV de origen ("Cañal" -> "CaÃ±al")
+    return name.encode('utf-8').decode('latin-1')
+
+
+def format_latitude(latitude):
+    seconds = round(abs(latitude) * 3600)
+    return "%d&deg %d' %d'' S" % (seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+def synthetic_stations(stations, random):
+    latitudes = numpy.round(random.uniform(-55, -18, stations), 6)
+    altitudes = random.integers(5, 2500, stations)
+
+    catalog = []
+    for station in range(stations):
+        name = 'Estación Sintética %03d, Pueblo Año %03d Ad.' % (station + 1, station + 1)
+        catalog.append({
+            'estacion': name,
+            'region': regions[station % len(regions)],
+            'latitud': latitudes[station],
+            'altitud': int(altitudes[station]),
+            # Precipitaciones trae solo el final del nombre y temperaturas el nombre completo, ambos mal codificados
+            'variante_precipitaciones': mis_encode('  Pueblo Año %03d Ad.' % (station + 1)),
+            'variante_temperaturas': mis_encode(name.replace(', ', ',  ')),
+        })
+
+    return pandas.DataFrame(catalog)
+
+
+def observation_dates(years, days):
+    # Días 1..days de cada mes (sin pasar del largo del mes) de cada año
+    dates = pandas.date_range('%s-01-01' % (first_year), '%s-12-31' % (first_year + years - 1), freq='D')
+    dates = dates[dates.day <= days]
+
+    return pandas.DataFrame({'año': dates.year, 'mes': dates.month, 'dia': dates.day})
+
+
+def generate(output_dir, stations, years, days, seed=0):
+    random = numpy.random.default_rng(seed)
+    os.makedirs(output_dir, exist_ok=True)
+
+    catalog = synthetic_stations(stations, random)
+    dates = observation_dates(years, days)
+
+    # Producto estaciones x fechas, con la estación como categoría para no repetir los textos
+    station_codes = numpy.repeat(numpy.arange(stations), len(dates))
+    observations = pandas.DataFrame({
+        'latitud': pandas.Categorical.from_codes(station_codes, catalog['latitud'].map(format_latitude)),
+        'altitud': catalog['altitud'].values[station_codes],
+        **{column: numpy.tile(dates[column].values, stations) for column in dates.columns},
+    })
+    rows = len(observations)
+
+    precipitation = numpy.where(random.random(rows) < 0.2, numpy.round(random.gamma(1.2, 6, rows), 1), 0.0)
+    precipitaciones = observations.assign(precipitacion=precipitation)
+    precipitaciones.insert(0, 'estacion', pandas.Categorical.from_codes(
+        station_codes, catalog['variante_precipitaciones']))
+
+    minimum_temperature = numpy.round(random.normal(8, 5, rows), 1)
+    maximum_temperature = pandas.Series(numpy.round(
+        minimum_temperature + random.gamma(4, 2.5, rows), 1)).map('{:.1f}'.format)
+    # Una de cada siete temperaturas máximas trae una coma al final y un 0.5% de mínimas viene vacía
+    maximum_temperature = maximum_temperature.where(random.random(rows) >= 1 / 7, maximum_temperature + ',')
+    minimum_temperature[random.random(rows) < 0.005] = numpy.nan
+
+    temperaturas = observations.assign(
+        temperatura_minima=minimum_temperature, temperatura_maxima=maximum_temperature.values)
+    temperaturas.insert(0, 'estacion', pandas.Categorical.from_codes(
+        station_codes, catalog['variante_temperaturas']))
+    # Algunas filas repetidas, como en los datos reales
+    temperaturas = pandas.concat([temperaturas, temperaturas.iloc[:min(rows, 50)]])
+
+    files = {
+        'precipitaciones': path.join(output_dir, 'precipitaciones.csv'),
+        'temperaturas': path.join(output_dir, 'temperaturas.csv'),
+        'estaciones': path.join(output_dir, 'estaciones.csv'),
+    }
+    precipitaciones.to_csv(files['precipitaciones'], sep=';', encoding='latin-1', index=False)
+    temperaturas.to_csv(files['temperaturas'], sep=';', encoding='latin-1', index=False)
+
+    variants = pandas.concat([catalog.assign(variante=catalog[column]) for column in (
+        'estacion', 'variante_precipitaciones', 'variante_temperaturas')])
+    variants[['variante', 'estacion', 'region', 'latitud', 'altitud']].to_csv(
+        files['estaciones'], sep=';', encoding='utf-8', index=False, quoting=csv.QUOTE_NONNUMERIC)
+
+    return files, {'precipitaciones': len(precipitaciones), 'temperaturas': len(temperaturas)}
+
+
+def parse_scale(scale):
+    # "estaciones x años x días por mes", por ejemplo "20x5x31"
+    stations, years, days = [int(value) for value in scale.lower().split('x')]
+    if (stations < 1 or years < 1 or not 1 <= days <= 31):
+        raise argparse.ArgumentTypeError('Escala inválida: %s' % (scale))
+
+    return stations, years, days
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generar CSV meteorológicos sintéticos')
+    parser.add_argument('output_dir', help='directorio donde se escriben los CSV y el catálogo')
+    parser.add_argument('--scale', type=parse_scale, default=(20, 5, 31),
+                        help='estaciones x años x días por mes (por defecto 20x5x31)')
+    parser.add_argument('--seed', type=int, default=0)
+    arguments = parser.parse_args()
+
+    files, rows = generate(arguments.output_dir, *arguments.scale, seed=arguments.seed)
+    for source_name, rows_count in rows.items():
+        print('%s: %s filas en %s' % (source_name, rows_count, files[source_name]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import json
+import shutil
+from os import makedirs, path, replace
+
+import pandas
+
+default_checkpoint_path = path.join(path.dirname(
+    path.realpath(__file__)), 'etl_state', 'checkpoint')
+
+
+class RunCheckpoint:
+    def __init__(self, checkpoint_path):
+        # Salida de la transformación de la última ejecución cuya carga no terminó, con su run_id.
+        # Sin checkpoint_path el estado solo se conserva en memoria
+        self.checkpoint_path = checkpoint_path
+        self.run_id = None
+        self.settings = {}
+
+    def __manifest_path(self):
+        return path.join(self.checkpoint_path, 'manifest.json')
+
+    def exists(self):
+        return self.checkpoint_path is not None and path.exists(self.__manifest_path())
+
+    def start(self, run_id, frames, settings):
+        # Guardar la salida de la transformación antes de comenzar la carga; el manifiesto se escribe al
+        # final, para que un checkpoint a medio escribir no se pueda reanudar. settings guarda los
+        # parámetros que definen los lotes (tamaño de fragmento, ...): al reanudar se usan los mismos
+        self.clear()
+        self.run_id = run_id
+        self.settings = dict(settings)
+        if (self.checkpoint_path is None):
+            return
+
+        makedirs(self.checkpoint_path, exist_ok=True)
+        frames = {name: dataframe for name, dataframe in frames.items() if dataframe is not None}
+        for name, dataframe in frames.items():
+            dataframe.to_pickle(path.join(self.checkpoint_path, name + '.pkl'))
+
+        temporary_file_path = self.__manifest_path() + '.tmp'
+        with open(temporary_file_path, 'w', encoding='utf-8') as manifest_file:
+            json.dump({'run_id': run_id, 'frames': sorted(frames), 'settings': self.settings}, manifest_file, indent=2)
+        replace(temporary_file_path, self.__manifest_path())
+
+    def restore(self):
+        with open(self.__manifest_path(), encoding='utf-8') as manifest_file:
+            manifest = json.load(manifest_file)
+
+        self.run_id = manifest['run_id']
+        self.settings = manifest['settings']
+        return {name: pandas.read_pickle(path.join(self.checkpoint_path, name + '.pkl')) for name in manifest['frames']}
+
+    def clear(self):
+        self.run_id = None
+        self.settings = {}
+        if (self.checkpoint_path is not None):
+            shutil.rmtree(self.checkpoint_path, ignore_errors=True)
+
+
+# Lotes confirmados en la base de datos. Cada lote se registra en la misma transacción que sus filas,
+# así que un lote registrado está completo y uno sin registrar no dejó nada escrito
+
+def committed_batches(db_connection, run_id, stage):
+    from sqlalchemy import select
+    from warehouse_schema import etl_checkpoint
+
+    return {batch for batch, in db_connection.execute(select(etl_checkpoint.c.LOTE).where(
+        etl_checkpoint.c.RUN_ID == run_id, etl_checkpoint.c.ETAPA == stage))}
+
+
+def record_batch(db_connection, run_id, stage, batch):
+    from sqlalchemy import insert
+    from warehouse_schema import etl_checkpoint
+
+    db_connection.execute(insert(etl_checkpoint).values(RUN_ID=run_id, ETAPA=stage, LOTE=batch))
+
+
+def clear_batches(db_connection, run_id):
+    from sqlalchemy import delete
+    from warehouse_schema import etl_checkpoint
+
+    db_connection.execute(delete(etl_checkpoint).where(etl_checkpoint.c.RUN_ID == run_id))
+
+
+def expire_batches(db_connection, run_id):
+    # Lotes de ejecuciones abandonadas sin reanudar: una ejecución nueva reemplaza el checkpoint, así que
+    # solo la suya se puede reanudar
+    from sqlalchemy import delete
+    from warehouse_schema import etl_checkpoint
+
+    db_connection.execute(delete(etl_checkpoint).where(etl_checkpoint.c.RUN_ID != run_id))
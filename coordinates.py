@@ -0,0 +1,28 @@
+import numpy
+import pandas
+
+# Grados, minutos y segundos opcionales y hemisferio, una vez reemplazados "&deg", "°" y las comillas por espacios
+coordinates_pattern = r'^\s*(?P<grados>\d+)(?:\s+(?P<minutos>\d+))?(?:\s+(?P<segundos>\d+))?\s+(?P<hemisferio>[NSEW])\s*$'
+
+hemisphere_signs = {'N': 1, 'S': -1, 'E': 1, 'W': -1}
+
+
+def parse_coordinates(coordinates):
+    # Las cadenas distintas son pocas: se parsea cada una una sola vez y el resultado se
+    # expande a todas las filas con sus códigos
+    codes, unique_coordinates = pandas.factorize(coordinates)
+    unique_coordinates = pandas.Series(unique_coordinates, dtype='object')
+
+    parts = unique_coordinates.str.replace(
+        r"&deg;?|°|'|\"", ' ', regex=True).str.extract(coordinates_pattern)
+
+    invalid_coordinates = parts['grados'].isna()
+    if (invalid_coordinates.any()):
+        raise ValueError('Coordenadas con formato desconocido: %s' % (
+            ', '.join(unique_coordinates[invalid_coordinates])))
+
+    degrees = (parts['grados'].astype('int64') + parts['minutos'].fillna(0).astype('int64') / 60.0
+               + parts['segundos'].fillna(0).astype('int64') / 3600.0) * parts['hemisferio'].map(hemisphere_signs)
+
+    values = numpy.append(degrees.to_numpy(dtype='float64'), numpy.nan)
+    return pandas.Series(values[codes], index=coordinates.index, name=coordinates.name)
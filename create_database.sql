@@ -77,13 +77,118 @@ CREATE TABLE `fact_temprec` (
   `MAXIMA_TEMPERATURA_MINIMA` float NOT NULL,
   `PROMEDIO_TEMPERATURA_MINIMA` float NOT NULL,
   `PROMEDIO_TEMPERATURA_MAXIMA` float NOT NULL,
-  `SUMA_PRECIPITACION` float NOT NULL,
+  `SUMA_TEMPERATURA_MINIMA` double NOT NULL DEFAULT 0,
+  `SUMA_TEMPERATURA_MAXIMA` double NOT NULL DEFAULT 0,
+  `SUMA_PRECIPITACION` double NOT NULL,
   `PROMEDIO_PRECIPITACION` float NOT NULL,
   `PRECIPITACION_MAXIMA` float NOT NULL,
   `PRECIPITACION_MINIMA` float NOT NULL,
+  `CANTIDAD_OBSERVACIONES` int(11) NOT NULL DEFAULT 0,
   `VIGENTE` boolean DEFAULT 1
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+-- --------------------------------------------------------
+
+--
+-- Table structure for table `agg_region_mes`
+--
+
+CREATE TABLE `agg_region_mes` (
+  `ID_REGION` int(11) NOT NULL,
+  `ID_PERIODO` int(11) NOT NULL,
+  `CANTIDAD_OBSERVACIONES` int(11) NOT NULL,
+  `SUMA_TEMPERATURA_MINIMA` double NOT NULL,
+  `MINIMA_TEMPERATURA_MINIMA` float NOT NULL,
+  `MAXIMA_TEMPERATURA_MINIMA` float NOT NULL,
+  `SUMA_TEMPERATURA_MAXIMA` double NOT NULL,
+  `MINIMA_TEMPERATURA_MAXIMA` float NOT NULL,
+  `MAXIMA_TEMPERATURA_MAXIMA` float NOT NULL,
+  `SUMA_PRECIPITACION` double NOT NULL,
+  `PRECIPITACION_MINIMA` float NOT NULL,
+  `PRECIPITACION_MAXIMA` float NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- --------------------------------------------------------
+
+--
+-- Table structure for table `agg_region_annio`
+--
+
+CREATE TABLE `agg_region_annio` (
+  `ID_REGION` int(11) NOT NULL,
+  `ANNIO` int(4) NOT NULL,
+  `CANTIDAD_OBSERVACIONES` int(11) NOT NULL,
+  `SUMA_TEMPERATURA_MINIMA` double NOT NULL,
+  `MINIMA_TEMPERATURA_MINIMA` float NOT NULL,
+  `MAXIMA_TEMPERATURA_MINIMA` float NOT NULL,
+  `SUMA_TEMPERATURA_MAXIMA` double NOT NULL,
+  `MINIMA_TEMPERATURA_MAXIMA` float NOT NULL,
+  `MAXIMA_TEMPERATURA_MAXIMA` float NOT NULL,
+  `SUMA_PRECIPITACION` double NOT NULL,
+  `PRECIPITACION_MINIMA` float NOT NULL,
+  `PRECIPITACION_MAXIMA` float NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- --------------------------------------------------------
+
+--
+-- Table structure for table `agg_estacion_annio`
+--
+
+CREATE TABLE `agg_estacion_annio` (
+  `ID_ESTACION` int(11) NOT NULL,
+  `ANNIO` int(4) NOT NULL,
+  `ID_REGION` int(11) NOT NULL,
+  `CANTIDAD_OBSERVACIONES` int(11) NOT NULL,
+  `SUMA_TEMPERATURA_MINIMA` double NOT NULL,
+  `MINIMA_TEMPERATURA_MINIMA` float NOT NULL,
+  `MAXIMA_TEMPERATURA_MINIMA` float NOT NULL,
+  `SUMA_TEMPERATURA_MAXIMA` double NOT NULL,
+  `MINIMA_TEMPERATURA_MAXIMA` float NOT NULL,
+  `MAXIMA_TEMPERATURA_MAXIMA` float NOT NULL,
+  `SUMA_PRECIPITACION` double NOT NULL,
+  `PRECIPITACION_MINIMA` float NOT NULL,
+  `PRECIPITACION_MAXIMA` float NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- --------------------------------------------------------
+
+--
+-- Table structure for table `fact_temprec_diaria`
+-- (particionada por año: el ETL separa de `pmax` una partición por cada año nuevo que carga)
+--
+
+CREATE TABLE `fact_temprec_diaria` (
+  `ID_TEMPREC_DIARIA` int(11) NOT NULL,
+  `ANNIO` int(4) NOT NULL,
+  `MES` int(2) NOT NULL,
+  `DIA` int(2) NOT NULL,
+  `ID_PERIODO` int(11) NOT NULL,
+  `ID_ESTACION` int(11) NOT NULL,
+  `ID_REGION` int(11) NOT NULL,
+  `TEMPERATURA_MINIMA` float DEFAULT NULL,
+  `TEMPERATURA_MAXIMA` float DEFAULT NULL,
+  `PRECIPITACION` float DEFAULT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+PARTITION BY RANGE (`ANNIO`)
+(
+PARTITION pmax VALUES LESS THAN MAXVALUE ENGINE=InnoDB
+);
+
+-- --------------------------------------------------------
+
+--
+-- Table structure for table `etl_checkpoint`
+-- (lotes de la carga confirmados por ejecución, para reanudar una carga interrumpida)
+--
+
+CREATE TABLE `etl_checkpoint` (
+  `RUN_ID` varchar(64) NOT NULL,
+  `ETAPA` varchar(50) NOT NULL,
+  `LOTE` int(11) NOT NULL,
+  `FECHA` datetime DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
 --
 -- Indexes for dumped tables
 --
@@ -92,19 +197,22 @@ CREATE TABLE `fact_temprec` (
 -- Indexes for table `dim_estacion`
 --
 ALTER TABLE `dim_estacion`
-  ADD PRIMARY KEY (`ID_ESTACION`);
+  ADD PRIMARY KEY (`ID_ESTACION`),
+  ADD UNIQUE KEY `NOMBRE` (`NOMBRE`);
 
 --
 -- Indexes for table `dim_periodo`
 --
 ALTER TABLE `dim_periodo`
-  ADD PRIMARY KEY (`ID_PERIODO`);
+  ADD PRIMARY KEY (`ID_PERIODO`),
+  ADD UNIQUE KEY `ANNIO_MES` (`ANNIO`, `MES`);
 
 --
 -- Indexes for table `dim_region`
 --
 ALTER TABLE `dim_region`
-  ADD PRIMARY KEY (`ID_REGION`);
+  ADD PRIMARY KEY (`ID_REGION`),
+  ADD UNIQUE KEY `NOMBRE_REGION` (`NOMBRE_REGION`);
 
 --
 -- Indexes for table `fact_temprec`
@@ -113,8 +221,47 @@ ALTER TABLE `fact_temprec`
   ADD PRIMARY KEY (`ID_TEMPREC`),
   ADD KEY `ID_PERIODO` (`ID_PERIODO`),
   ADD KEY `ID_ESTACION` (`ID_ESTACION`),
+  ADD KEY `ID_REGION` (`ID_REGION`),
+  ADD KEY `ESTACION_PERIODO_VIGENTE` (`ID_ESTACION`, `ID_PERIODO`, `VIGENTE`),
+  ADD KEY `REGION_PERIODO_VIGENTE` (`ID_REGION`, `ID_PERIODO`, `VIGENTE`);
+
+--
+-- Indexes for table `agg_region_mes`
+--
+ALTER TABLE `agg_region_mes`
+  ADD PRIMARY KEY (`ID_REGION`, `ID_PERIODO`),
+  ADD KEY `PERIODO_REGION` (`ID_PERIODO`, `ID_REGION`);
+
+--
+-- Indexes for table `agg_region_annio`
+--
+ALTER TABLE `agg_region_annio`
+  ADD PRIMARY KEY (`ID_REGION`, `ANNIO`),
+  ADD KEY `ANNIO_REGION` (`ANNIO`, `ID_REGION`);
+
+--
+-- Indexes for table `agg_estacion_annio`
+--
+ALTER TABLE `agg_estacion_annio`
+  ADD PRIMARY KEY (`ID_ESTACION`, `ANNIO`),
+  ADD KEY `ANNIO_ESTACION` (`ANNIO`, `ID_ESTACION`),
   ADD KEY `ID_REGION` (`ID_REGION`);
 
+--
+-- Indexes for table `fact_temprec_diaria`
+--
+ALTER TABLE `fact_temprec_diaria`
+  ADD PRIMARY KEY (`ID_TEMPREC_DIARIA`, `ANNIO`),
+  ADD KEY `ESTACION_FECHA` (`ID_ESTACION`, `ANNIO`, `MES`, `DIA`),
+  ADD KEY `REGION_FECHA` (`ID_REGION`, `ANNIO`, `MES`, `DIA`),
+  ADD KEY `PERIODO_ESTACION` (`ID_PERIODO`, `ID_ESTACION`);
+
+--
+-- Indexes for table `etl_checkpoint`
+--
+ALTER TABLE `etl_checkpoint`
+  ADD PRIMARY KEY (`RUN_ID`, `ETAPA`, `LOTE`);
+
 --
 -- AUTO_INCREMENT for dumped tables
 --
@@ -143,6 +290,12 @@ ALTER TABLE `dim_region`
 ALTER TABLE `fact_temprec`
   MODIFY `ID_TEMPREC` int(11) NOT NULL AUTO_INCREMENT;
 
+--
+-- AUTO_INCREMENT for table `fact_temprec_diaria`
+--
+ALTER TABLE `fact_temprec_diaria`
+  MODIFY `ID_TEMPREC_DIARIA` int(11) NOT NULL AUTO_INCREMENT;
+
 --
 -- Constraints for dumped tables
 --
@@ -154,6 +307,26 @@ ALTER TABLE `fact_temprec`
   ADD CONSTRAINT `fact_temprec_ibfk_1` FOREIGN KEY (`ID_PERIODO`) REFERENCES `dim_periodo` (`ID_PERIODO`),
   ADD CONSTRAINT `fact_temprec_ibfk_2` FOREIGN KEY (`ID_ESTACION`) REFERENCES `dim_estacion` (`ID_ESTACION`),
   ADD CONSTRAINT `fact_temprec_ibfk_3` FOREIGN KEY (`ID_REGION`) REFERENCES `dim_region` (`ID_REGION`);
+
+--
+-- Constraints for table `agg_region_mes`
+--
+ALTER TABLE `agg_region_mes`
+  ADD CONSTRAINT `agg_region_mes_ibfk_1` FOREIGN KEY (`ID_REGION`) REFERENCES `dim_region` (`ID_REGION`),
+  ADD CONSTRAINT `agg_region_mes_ibfk_2` FOREIGN KEY (`ID_PERIODO`) REFERENCES `dim_periodo` (`ID_PERIODO`);
+
+--
+-- Constraints for table `agg_region_annio`
+--
+ALTER TABLE `agg_region_annio`
+  ADD CONSTRAINT `agg_region_annio_ibfk_1` FOREIGN KEY (`ID_REGION`) REFERENCES `dim_region` (`ID_REGION`);
+
+--
+-- Constraints for table `agg_estacion_annio`
+--
+ALTER TABLE `agg_estacion_annio`
+  ADD CONSTRAINT `agg_estacion_annio_ibfk_1` FOREIGN KEY (`ID_ESTACION`) REFERENCES `dim_estacion` (`ID_ESTACION`),
+  ADD CONSTRAINT `agg_estacion_annio_ibfk_2` FOREIGN KEY (`ID_REGION`) REFERENCES `dim_region` (`ID_REGION`);
 COMMIT;
 
 /*!40101 SET CHARACTER_SET_CLIENT=@OLD_CHARACTER_SET_CLIENT */;
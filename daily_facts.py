@@ -0,0 +1,67 @@
+from warehouse_schema import fact_temprec, fact_temprec_diaria
+from sqlalchemy import delete, exists, func, insert, select, tuple_, update
+
+# Columnas de joined_dataframes y su columna correspondiente en fact_temprec_diaria
+daily_fact_columns_map = {
+    'año': 'ANNIO',
+    'mes': 'MES',
+    'dia': 'DIA',
+    'temperatura_minima': 'TEMPERATURA_MINIMA',
+    'temperatura_maxima': 'TEMPERATURA_MAXIMA',
+    'precipitacion': 'PRECIPITACION',
+}
+
+daily_fact_table_columns = ['ID_PERIODO', 'ID_ESTACION', 'ID_REGION', *daily_fact_columns_map.values()]
+
+# Columnas de fact_temprec y cómo se calculan desde los hechos diarios de cada (estación, periodo),
+# los mismos agregados que aggregate_observations
+monthly_fact_measures = [
+    ('MINIMA_TEMPERATURA_MAXIMA', lambda daily: func.min(daily.c.TEMPERATURA_MAXIMA)),
+    ('MAXIMA_TEMPERATURA_MAXIMA', lambda daily: func.max(daily.c.TEMPERATURA_MAXIMA)),
+    ('MINIMA_TEMPERATURA_MINIMA', lambda daily: func.min(daily.c.TEMPERATURA_MINIMA)),
+    ('MAXIMA_TEMPERATURA_MINIMA', lambda daily: func.max(daily.c.TEMPERATURA_MINIMA)),
+    ('PROMEDIO_TEMPERATURA_MINIMA', lambda daily: func.avg(daily.c.TEMPERATURA_MINIMA)),
+    ('PROMEDIO_TEMPERATURA_MAXIMA', lambda daily: func.avg(daily.c.TEMPERATURA_MAXIMA)),
+    ('SUMA_TEMPERATURA_MINIMA', lambda daily: func.sum(daily.c.TEMPERATURA_MINIMA)),
+    ('SUMA_TEMPERATURA_MAXIMA', lambda daily: func.sum(daily.c.TEMPERATURA_MAXIMA)),
+    ('SUMA_PRECIPITACION', lambda daily: func.sum(daily.c.PRECIPITACION)),
+    ('PROMEDIO_PRECIPITACION', lambda daily: func.avg(daily.c.PRECIPITACION)),
+    ('PRECIPITACION_MAXIMA', lambda daily: func.max(daily.c.PRECIPITACION)),
+    ('PRECIPITACION_MINIMA', lambda daily: func.min(daily.c.PRECIPITACION)),
+    ('CANTIDAD_OBSERVACIONES', lambda daily: func.count(daily.c.PRECIPITACION)),
+]
+
+
+def delete_daily_facts(db_connection, groups):
+    # Borrar las observaciones ya cargadas de los grupos (ID_ESTACION, ID_PERIODO, ANNIO) que se
+    # vuelven a cargar. El filtro por ANNIO permite a MySQL podar las particiones
+    years = sorted({year for station_id, period_id, year in groups})
+
+    return db_connection.execute(delete(fact_temprec_diaria).where(
+        fact_temprec_diaria.c.ANNIO.in_(years),
+        tuple_(fact_temprec_diaria.c.ID_ESTACION, fact_temprec_diaria.c.ID_PERIODO).in_(
+            [(station_id, period_id) for station_id, period_id, year in groups]))).rowcount
+
+
+def derive_monthly_facts(db_connection, period_ids, years):
+    # Recalcular en la base de datos los hechos mensuales de los periodos tocados a partir de los
+    # diarios: se retiran (VIGENTE = 0) los hechos vigentes de las estaciones con observaciones diarias
+    # en esos periodos y se insertan los nuevos con un solo INSERT ... SELECT
+    period_ids = sorted(set(period_ids))
+    years = sorted(set(years))
+    if (not period_ids):
+        return 0
+
+    daily = fact_temprec_diaria
+    loaded_periods = [daily.c.ANNIO.in_(years), daily.c.ID_PERIODO.in_(period_ids)]
+
+    db_connection.execute(update(fact_temprec).where(
+        fact_temprec.c.ID_PERIODO.in_(period_ids), fact_temprec.c.VIGENTE == 1,
+        exists().where(*loaded_periods, daily.c.ID_ESTACION == fact_temprec.c.ID_ESTACION,
+                       daily.c.ID_PERIODO == fact_temprec.c.ID_PERIODO)).values(VIGENTE=0))
+
+    return db_connection.execute(insert(fact_temprec).from_select(
+        ['ID_PERIODO', 'ID_ESTACION', 'ID_REGION', *[column for column, measure in monthly_fact_measures]],
+        select(daily.c.ID_PERIODO, daily.c.ID_ESTACION, func.max(daily.c.ID_REGION),
+               *[measure(daily).label(column) for column, measure in monthly_fact_measures]).where(
+            *loaded_periods).group_by(daily.c.ID_ESTACION, daily.c.ID_PERIODO))).rowcount
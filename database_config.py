@@ -3,3 +3,9 @@ DATABASE_HOST="127.0.0.1"
 DATABASE_PASSWORD=""
 DATABASE_PORT=3306
 DATABASE_USER="root"
+
+# Backend de carga: "mysql-insert" (INSERT por lotes), "mysql" (LOAD DATA LOCAL INFILE, requiere
+# local_infile habilitado en el cliente y en el servidor) o "sqlite"
+DATABASE_BACKEND="mysql-insert"
+DATABASE_SQLITE_PATH="bi_proyecto_semestral.sqlite"
+LOAD_BATCH_SIZE=1000
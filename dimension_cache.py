@@ -0,0 +1,53 @@
+import pandas
+from sqlalchemy import insert, select
+
+
+def insert_records(db_connection, table, records):
+    db_connection.execute(insert(table), records)
+
+
+class DimensionCache:
+    def __init__(self, table, id_column, key_columns_map, attribute_columns_map=None, insert_rows=None):
+        # key_columns_map y attribute_columns_map relacionan columnas de la tabla con columnas del dataframe
+        # insert_rows(db_connection, table, records) permite usar la carga masiva del backend
+        self.table = table
+        self.id_column = id_column
+        self.key_columns_map = key_columns_map
+        self.attribute_columns_map = attribute_columns_map or {}
+        self.keys = {}
+        self.insert_rows = insert_rows or insert_records
+
+    def load(self, db_connection):
+        # Precargar el mapa clave natural -> ID con una sola consulta
+        select_keys = select(self.table.c[self.id_column], *[
+            self.table.c[column] for column in self.key_columns_map]).order_by(self.table.c[self.id_column])
+
+        self.keys = {}
+        for row in db_connection.execute(select_keys):
+            self.keys.setdefault(tuple(row[1:]), row[0])
+
+    def ensure(self, db_connection, dataframe):
+        # Insertar en un solo lote los miembros que aún no existen en la dimensión
+        columns_map = {**self.key_columns_map, **self.attribute_columns_map}
+        members = dataframe[list(columns_map.values())].drop_duplicates(
+            list(self.key_columns_map.values()))
+
+        member_keys = members[list(self.key_columns_map.values())].itertuples(
+            index=False, name=None)
+        missing_members = members.loc[[
+            key not in self.keys for key in member_keys]]
+
+        if (len(missing_members)):
+            records = missing_members.rename(columns={
+                dataframe_column: table_column for table_column, dataframe_column in columns_map.items()}).to_dict('records')
+            self.insert_rows(db_connection, self.table, records)
+
+            # executemany no expone los ID generados (ni MySQL soporta RETURNING), se releen en una consulta
+            self.load(db_connection)
+
+        return len(missing_members)
+
+    def frame(self, id_name):
+        # Mapa de llaves como dataframe, listo para unirse a los hechos
+        return pandas.DataFrame([(*key, id) for key, id in self.keys.items()], columns=[
+            *self.key_columns_map.values(), id_name])
@@ -0,0 +1,36 @@
+import hashlib
+import json
+from os import makedirs, path, replace
+
+default_watermark_directory = path.join(path.dirname(path.realpath(__file__)), 'etl_state')
+
+
+def target_key(target):
+    # Clave corta de la base de datos de destino para los archivos de estado propios de cada destino
+    return hashlib.sha256(target.encode('utf-8')).hexdigest()[:16]
+
+
+def watermark_path_for(watermark_directory, target):
+    # Unas marcas de agua por destino de la carga: las fechas cargadas en una base de datos no dicen nada de otra
+    return path.join(watermark_directory, 'watermarks-%s.json' % (target_key(target)))
+
+
+def load_watermarks(watermark_file_path):
+    # Último (año, mes, dia) cargado por estación; vacío si nunca se ha ejecutado una carga
+    if (not path.exists(watermark_file_path)):
+        return {}
+
+    with open(watermark_file_path, encoding='utf-8') as watermark_file:
+        return {station: tuple(date) for station, date in json.load(watermark_file).items()}
+
+
+def save_watermarks(watermark_file_path, watermarks):
+    makedirs(path.dirname(watermark_file_path), exist_ok=True)
+
+    # Escribir a un archivo temporal y reemplazar, para no dejar un estado a medio escribir
+    temporary_file_path = watermark_file_path + '.tmp'
+    with open(temporary_file_path, 'w', encoding='utf-8') as watermark_file:
+        json.dump({station: list(date) for station, date in sorted(watermarks.items())},
+                  watermark_file, ensure_ascii=False, indent=2)
+
+    replace(temporary_file_path, watermark_file_path)
@@ -0,0 +1,158 @@
+import collections
+import glob
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from os import makedirs, path, replace, stat
+
+import pandas
+from pandas.api.types import union_categoricals
+
+from etl_state import target_key
+from schema import empty_observations, read_observations
+
+default_manifest_directory = path.join(path.dirname(path.realpath(__file__)), 'etl_state')
+
+default_read_workers = 4
+
+# Archivos más lentos que se informan al terminar la lectura
+default_slowest_files = 10
+
+SourceFile = collections.namedtuple('SourceFile', [
+    'source_name', 'file_path', 'signature', 'observations', 'keys', 'seconds'])
+
+
+def expand_source(source, base_path):
+    # Un origen es un archivo, un directorio (todos sus .csv) o un patrón glob; las rutas relativas son
+    # relativas a base_path. Los archivos se ordenan para que la concatenación sea determinista
+    patterns = [source] if isinstance(source, str) else list(source)
+    file_paths = []
+    for pattern in patterns:
+        pattern = path.join(base_path, pattern)
+        if (path.isdir(pattern)):
+            file_paths.extend(glob.glob(path.join(pattern, '*.csv')))
+        elif (glob.has_magic(pattern)):
+            file_paths.extend(glob.glob(pattern, recursive=True))
+        else:
+            file_paths.append(pattern)
+
+    if (not file_paths):
+        raise FileNotFoundError('No hay archivos CSV en %s.' % (', '.join(patterns)))
+
+    return sorted({path.realpath(file_path) for file_path in file_paths})
+
+
+def file_signature(file_path):
+    file_stat = stat(file_path)
+    return (file_stat.st_size, file_stat.st_mtime_ns)
+
+
+def observation_keys(observations, station_catalog):
+    # Pares (estacion, año) del archivo con el nombre canónico del catálogo: un grupo (estacion, mes, año)
+    # solo depende de los archivos que comparten su par
+    pairs = observations[['estacion', 'año']].drop_duplicates()
+    stations = station_catalog.canonical_names(pairs['estacion'].astype('object'))
+
+    return {(station, int(year)) for station, year in zip(stations, pairs['año'])
+            if isinstance(station, str) and not pandas.isna(year)}
+
+
+def manifest_path_for(manifest_directory, target):
+    # Un manifiesto por destino de la carga: lo cargado en una base de datos no dice nada de otra
+    return path.join(manifest_directory, 'source_manifest-%s.json' % (target_key(target)))
+
+
+class SourceManifest:
+    def __init__(self, manifest_path):
+        # Tamaño, fecha de modificación y pares (estacion, año) de cada archivo ya cargado. Las lecturas
+        # de la ejecución quedan pendientes hasta que save() las confirma, después de la carga
+        self.manifest_path = manifest_path
+        self.files = {}
+        self.pending = {}
+        if (manifest_path is not None and path.exists(manifest_path)):
+            with open(manifest_path, encoding='utf-8') as manifest_file:
+                self.files = json.load(manifest_file)
+
+    def unchanged(self, file_path, signature):
+        entry = self.files.get(file_path)
+        return entry is not None and (entry['size'], entry['mtime_ns']) == signature
+
+    def keys(self, file_path):
+        entry = self.files.get(file_path)
+        return set() if entry is None else {(station, year) for station, year in entry['keys']}
+
+    def record(self, file_path, signature, keys):
+        size, mtime_ns = signature
+        self.pending[file_path] = {'size': size, 'mtime_ns': mtime_ns, 'keys': sorted(keys)}
+
+    def save(self):
+        if (self.manifest_path is None or not self.pending):
+            return
+
+        self.files.update(self.pending)
+        self.pending = {}
+        makedirs(path.dirname(self.manifest_path), exist_ok=True)
+
+        # Escribir a un archivo temporal y reemplazar, igual que las marcas de agua
+        temporary_file_path = self.manifest_path + '.tmp'
+        with open(temporary_file_path, 'w', encoding='utf-8') as manifest_file:
+            json.dump(self.files, manifest_file, ensure_ascii=False, sort_keys=True)
+        replace(temporary_file_path, self.manifest_path)
+
+
+def read_source_files(files, station_catalog, max_workers=default_read_workers):
+    # Leer en un pool de hilos los archivos [(source_name, file_path)]: la lectura es sobre todo E/S y
+    # decodificación. Los resultados se entregan en el orden de files
+    def read_file(source_name, file_path):
+        signature = file_signature(file_path)
+        start_time = time.perf_counter()
+        observations = read_observations(file_path, source_name)
+        return SourceFile(source_name, file_path, signature, observations,
+                          observation_keys(observations, station_catalog), time.perf_counter() - start_time)
+
+    if (not files):
+        return []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda file: read_file(*file), files))
+
+
+def concat_observations(dataframes, source_name):
+    # Concatenar conservando los tipos del esquema: las categorías de cada archivo se unen en vez de
+    # convertir la columna a object
+    if (not dataframes):
+        return empty_observations(source_name)
+    if (len(dataframes) == 1):
+        return dataframes[0]
+
+    categorical_columns = [column for column, dtype in dataframes[0].dtypes.items() if dtype == 'category']
+    observations = pandas.concat([dataframe.drop(columns=categorical_columns) for dataframe in dataframes],
+                                 ignore_index=True)
+    for column in categorical_columns:
+        observations[column] = union_categoricals([dataframe[column] for dataframe in dataframes])
+
+    return observations[dataframes[0].columns]
+
+
+def file_throughput(source_file):
+    megabytes = source_file.signature[0] / (1024 * 1024)
+    seconds = max(source_file.seconds, 1e-9)
+
+    return {'archivo': source_file.file_path, 'filas': len(source_file.observations), 'mb': round(megabytes, 3),
+            'segundos': round(source_file.seconds, 6), 'filas_s': round(len(source_file.observations) / seconds),
+            'mb_s': round(megabytes / seconds, 3)}
+
+
+def report_throughput(source_files, slowest_files=default_slowest_files):
+    # Resumen de la lectura y los archivos más lentos, para detectar una entrega lenta o demasiado grande
+    throughput = [file_throughput(source_file) for source_file in source_files]
+    if (not throughput):
+        return throughput
+
+    print('Lectura: %s archivos, %s filas, %.1f MB.' % (
+        len(throughput), sum(file['filas'] for file in throughput), sum(file['mb'] for file in throughput)))
+    for file in sorted(throughput, key=lambda file: file['segundos'], reverse=True)[:slowest_files]:
+        print('  %-60s %9s filas %8.1f MB %7.3f s %10.0f filas/s %7.1f MB/s' % (
+            file['archivo'], file['filas'], file['mb'], file['segundos'], file['filas_s'], file['mb_s']))
+
+    return throughput
@@ -0,0 +1,126 @@
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from os import path
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+default_metrics_path = path.join(path.dirname(
+    path.realpath(__file__)), 'etl_state', 'metrics.jsonl')
+
+profilers = ['cprofile', 'tracemalloc']
+
+
+def peak_memory_mb():
+    # ru_maxrss se expresa en bytes en macOS y en KB en Linux; no disponible en Windows
+    if (resource is None):
+        return None
+
+    memory_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return memory_peak / (1024 * 1024) if sys.platform == 'darwin' else memory_peak / 1024
+
+
+class RunMetrics:
+    def __init__(self, metrics_path=None, profile=None):
+        # Sin metrics_path las etapas solo se acumulan en memoria (por ejemplo, dentro de un proceso del pool)
+        if (profile is not None and profile not in profilers):
+            raise ValueError('Perfilador desconocido: %s (disponibles: %s).' % (profile, ', '.join(profilers)))
+
+        self.metrics_path = metrics_path
+        self.profile = profile
+        self.run_id = time.strftime('%Y%m%dT%H%M%S') + '-%s' % (os.getpid())
+        self.stages = []
+        self.db_round_trips = 0
+        self.lock = threading.Lock()
+
+    def watch_engine(self, db_engine):
+        # Cada sentencia enviada al driver (incluido un executemany) cuenta como un viaje a la base de datos.
+        # SQLAlchemy se importa aquí para que las ejecuciones sin base de datos no lo carguen
+        from sqlalchemy import event
+
+        event.listen(db_engine, 'before_cursor_execute', self.__count_round_trip)
+
+    def __count_round_trip(self, *arguments):
+        with self.lock:
+            self.db_round_trips += 1
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        # El bloque puede completar record['rows_out'] (y corregir rows_in) antes de terminar.
+        # Los viajes a la base de datos se cuentan para todo el proceso: en etapas concurrentes
+        # cada una incluye también los de las demás
+        record = {'run_id': self.run_id, 'stage': name, 'rows_in': rows_in, 'rows_out': None}
+
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        start_memory_peak = peak_memory_mb()
+        start_round_trips = self.db_round_trips
+        try:
+            yield record
+        finally:
+            memory_peak = peak_memory_mb()
+            record.update({
+                'wall_s': round(time.perf_counter() - start_wall, 6),
+                'cpu_s': round(time.process_time() - start_cpu, 6),
+                'peak_rss_delta_mb': None if memory_peak is None else round(memory_peak - start_memory_peak, 3),
+                'db_round_trips': self.db_round_trips - start_round_trips,
+            })
+            with self.lock:
+                self.stages.append(record)
+
+    @contextmanager
+    def profiling(self):
+        # Perfil opcional de toda la ejecución, guardado junto al archivo de métricas
+        if (self.profile == 'cprofile'):
+            # cProfile solo perfila el hilo principal
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                profiler.dump_stats(self.artifact_path('.prof'))
+                print('Perfil de cProfile guardado en %s.' % (self.artifact_path('.prof')))
+        elif (self.profile == 'tracemalloc'):
+            tracemalloc.start(25)
+            try:
+                yield
+            finally:
+                snapshot = tracemalloc.take_snapshot()
+                tracemalloc.stop()
+                snapshot.dump(self.artifact_path('.tracemalloc'))
+                with open(self.artifact_path('.tracemalloc.txt'), 'w', encoding='utf-8') as report_file:
+                    for statistic in snapshot.statistics('lineno')[:50]:
+                        report_file.write('%s\n' % (statistic))
+                print('Snapshot de tracemalloc guardado en %s.' % (self.artifact_path('.tracemalloc')))
+        else:
+            yield
+
+    def artifact_path(self, suffix):
+        directory = path.dirname(self.metrics_path or default_metrics_path)
+        os.makedirs(directory, exist_ok=True)
+        return path.join(directory, 'run-%s%s' % (self.run_id, suffix))
+
+    def write(self):
+        # Una línea JSON por etapa, en orden de término; el archivo acumula todas las ejecuciones
+        if (self.metrics_path is None):
+            return
+
+        os.makedirs(path.dirname(self.metrics_path), exist_ok=True)
+        with open(self.metrics_path, 'a', encoding='utf-8') as metrics_file:
+            for record in self.stages:
+                metrics_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def report(self):
+        for record in self.stages:
+            print('%-32s %9.3f s  cpu %9.3f s  filas %s -> %s  rss +%s MB  consultas %s' % (
+                record['stage'], record['wall_s'], record['cpu_s'], record['rows_in'], record['rows_out'],
+                record['peak_rss_delta_mb'], record['db_round_trips']))
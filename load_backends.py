@@ -0,0 +1,174 @@
+from database_config import DATABASE_NAME, DATABASE_HOST, DATABASE_PASSWORD, DATABASE_PORT, DATABASE_USER, DATABASE_SQLITE_PATH
+import math
+import os
+import tempfile
+from os import path
+
+# SQLAlchemy se importa dentro de los métodos: elegir un backend (por ejemplo, en las opciones de main.py)
+# no carga la capa de base de datos, que solo se necesita al conectar
+
+
+class LoadBackend:
+    # Carga con sentencias INSERT de SQLAlchemy (executemany); sirve para cualquier motor soportado
+    name = 'mysql-insert'
+
+    def url(self):
+        return "mysql+pymysql://%s:%s@%s:%s/%s" % (
+            DATABASE_USER, DATABASE_PASSWORD, DATABASE_HOST, DATABASE_PORT, DATABASE_NAME)
+
+    def target(self):
+        # Base de datos de destino, sin la contraseña; los backends de MySQL comparten el destino
+        return "mysql://%s@%s:%s/%s" % (DATABASE_USER, DATABASE_HOST, DATABASE_PORT, DATABASE_NAME)
+
+    def create_engine(self, pool_size):
+        from sqlalchemy import create_engine
+
+        return create_engine(self.url(), pool_size=pool_size, max_overflow=0, pool_pre_ping=True)
+
+    def prepare(self, db_engine):
+        # El esquema de MySQL se crea con create_database.sql
+        pass
+
+    def insert_rows(self, db_connection, table, records, ignore_duplicates=False):
+        # Con ignore_duplicates las filas cuya llave única ya existe se omiten (upsert por llave natural)
+        from sqlalchemy import insert
+
+        statement = insert(table).prefix_with('IGNORE') if ignore_duplicates else insert(table)
+        db_connection.execute(statement, records)
+
+    def year_partitions(self, db_connection, table):
+        # Particiones por rango de año de la tabla: nombre -> límite superior exclusivo (None para MAXVALUE)
+        from sqlalchemy import text
+
+        partitions = db_connection.execute(text(
+            'SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS '
+            'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL'), {
+            'table': table.name})
+
+        return {name: None if bound == 'MAXVALUE' else int(bound) for name, bound in partitions}
+
+    def add_year_partitions(self, db_connection, table, years):
+        # Separar de pmax (VALUES LESS THAN MAXVALUE) una partición por año hasta el mayor de years. Los
+        # años bajo el primer límite quedan en la primera partición. ALTER TABLE hace commit implícito,
+        # por lo que debe ejecutarse fuera de las transacciones de carga
+        partitions = self.year_partitions(db_connection, table)
+        if ('pmax' not in partitions or not years):
+            return []
+
+        bounds = [bound for bound in partitions.values() if bound is not None]
+        first_year = max(bounds) if bounds else min(years)
+        new_years = list(range(first_year, max(years) + 1))
+
+        if (new_years):
+            db_connection.exec_driver_sql(
+                'ALTER TABLE `%s` REORGANIZE PARTITION pmax INTO (%s, PARTITION pmax VALUES LESS THAN MAXVALUE)' % (
+                    table.name, ', '.join('PARTITION p%s VALUES LESS THAN (%s)' % (year, year + 1) for year in new_years)))
+
+        return ['p%s' % (year) for year in new_years]
+
+    def drop_year_partitions(self, db_connection, table, before_year):
+        # Eliminar las particiones cuyos años son todos anteriores a before_year, sin borrar fila por fila
+        old_partitions = [name for name, bound in sorted(self.year_partitions(
+            db_connection, table).items(), key=lambda partition: partition[1] or 0) if bound is not None and bound <= before_year]
+
+        if (old_partitions):
+            db_connection.exec_driver_sql('ALTER TABLE `%s` DROP PARTITION %s' % (
+                table.name, ', '.join(old_partitions)))
+
+        return old_partitions
+
+
+class MySQLLoadBackend(LoadBackend):
+    # Carga con LOAD DATA LOCAL INFILE desde un TSV temporal, el cargador masivo de MySQL/MariaDB
+    name = 'mysql'
+
+    def create_engine(self, pool_size):
+        from sqlalchemy import create_engine
+
+        return create_engine(self.url(), pool_size=pool_size, max_overflow=0, pool_pre_ping=True,
+                             connect_args={'local_infile': True})
+
+    def insert_rows(self, db_connection, table, records, ignore_duplicates=False):
+        columns = list(records[0])
+
+        rows_file = tempfile.NamedTemporaryFile(
+            'w', suffix='.tsv', encoding='utf-8', newline='\n', delete=False)
+        try:
+            with rows_file:
+                for record in records:
+                    rows_file.write('\t'.join(tsv_value(record[column]) for column in columns) + '\n')
+
+            db_connection.exec_driver_sql(
+                "LOAD DATA LOCAL INFILE '%s' %sINTO TABLE `%s` CHARACTER SET utf8mb4 "
+                "FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' (%s)" % (
+                    rows_file.name.replace('\\', '/'), 'IGNORE ' if ignore_duplicates else '', table.name,
+                    ', '.join('`%s`' % column for column in columns)))
+        finally:
+            os.remove(rows_file.name)
+
+
+class SQLiteLoadBackend(LoadBackend):
+    # Base de datos local en un archivo, para ejecutar y medir el ETL sin un servidor MySQL
+    name = 'sqlite'
+
+    def __init__(self, database_path=DATABASE_SQLITE_PATH):
+        self.database_path = path.join(path.dirname(path.realpath(__file__)), database_path)
+
+    def url(self):
+        return 'sqlite:///%s' % (self.database_path)
+
+    def target(self):
+        return self.url()
+
+    def create_engine(self, pool_size):
+        # SQLite admite un solo escritor a la vez: las transacciones concurrentes esperan el bloqueo
+        from sqlalchemy import create_engine
+
+        return create_engine(self.url(), connect_args={'timeout': 60})
+
+    def prepare(self, db_engine):
+        from warehouse_schema import metadata
+
+        metadata.create_all(db_engine)
+
+    def insert_rows(self, db_connection, table, records, ignore_duplicates=False):
+        # executemany nativo de sqlite3 con tuplas, sin compilar una sentencia por fila
+        columns = list(records[0])
+        db_connection.exec_driver_sql('INSERT %sINTO "%s" (%s) VALUES (%s)' % (
+            'OR IGNORE ' if ignore_duplicates else '', table.name, ', '.join('"%s"' % column for column in columns), ', '.join('?' * len(columns))),
+            [tuple(record[column] for column in columns) for record in records])
+
+    def year_partitions(self, db_connection, table):
+        # SQLite no tiene particiones
+        return {}
+
+    def drop_year_partitions(self, db_connection, table, before_year):
+        from sqlalchemy import delete
+
+        print('SQLite no admite particiones, se borran las filas de %s anteriores a %s.' % (table.name, before_year))
+        db_connection.execute(delete(table).where(table.c.ANNIO < before_year))
+
+        return []
+
+
+load_backends = {backend.name: backend for backend in (
+    LoadBackend, MySQLLoadBackend, SQLiteLoadBackend)}
+
+
+def tsv_value(value):
+    # \N es NULL para LOAD DATA; los textos se escapan con las reglas por defecto de FIELDS ESCAPED BY
+    if (value is None or (isinstance(value, float) and math.isnan(value))):
+        return '\\N'
+    if (isinstance(value, bool)):
+        return str(int(value))
+    if (isinstance(value, str)):
+        return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+    return str(value)
+
+
+def create_load_backend(name):
+    if (name not in load_backends):
+        raise ValueError('Backend de carga desconocido: %s (disponibles: %s).' % (
+            name, ', '.join(sorted(load_backends))))
+
+    return load_backends[name]()
@@ -1,7 +1,86 @@
-from ETL_meteorologioco import ETLMeteorologico
+from checkpoint import default_checkpoint_path
+from ETL_meteorologioco import ETLMeteorologico, default_base_files_csv_relative_path, default_fact_batch_size, default_output_path, default_pool_size, default_shard_size
+from database_config import DATABASE_BACKEND
+from extraction import default_read_workers
+from instrumentation import default_metrics_path, profilers
+from load_backends import load_backends
+from staging import default_staging_path
+from validation import default_quarantine_path
+import argparse
 
 def main():
-    ETL = ETLMeteorologico()
+    parser = argparse.ArgumentParser(description='ETL de datos meteorológicos')
+    parser.add_argument('--incremental', action='store_true',
+                        help='cargar solo los meses con observaciones posteriores a la última carga de cada estación')
+    parser.add_argument('--chunk-size', type=int,
+                        help='leer los CSV por bloques de este número de filas para acotar la memoria')
+    parser.add_argument('--staging', nargs='?', const=default_staging_path,
+                        help='guardar y reutilizar las observaciones limpias en Parquet (por defecto en ./staging)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='número de procesos para transformar las estaciones en paralelo')
+    parser.add_argument('--pool-size', type=int, default=default_pool_size,
+                        help='conexiones a la base de datos para cargar los hechos en paralelo')
+    parser.add_argument('--shard-size', type=int, default=default_shard_size,
+                        help='número de hechos por fragmento, cada fragmento se inserta en su propia transacción')
+    parser.add_argument('--backend', choices=sorted(load_backends), default=DATABASE_BACKEND,
+                        help='backend de carga (por defecto el de database_config.py); mysql usa LOAD DATA LOCAL INFILE '
+                        'y requiere local_infile habilitado en el cliente y en el servidor')
+    parser.add_argument('--batch-size', type=int, default=default_fact_batch_size,
+                        help='número de filas por lote de inserción')
+    parser.add_argument('--metrics', default=default_metrics_path,
+                        help='archivo JSON lines donde se agregan las métricas por etapa (por defecto etl_state/metrics.jsonl)')
+    parser.add_argument('--profile', choices=profilers,
+                        help='perfilar la ejecución y guardar el resultado junto al archivo de métricas')
+    parser.add_argument('--daily-facts', action='store_true',
+                        help='cargar las observaciones diarias en fact_temprec_diaria y derivar de ellas los hechos mensuales')
+    parser.add_argument('--drop-daily-before', type=int, metavar='AÑO',
+                        help='eliminar las particiones de fact_temprec_diaria anteriores a este año, sin ejecutar el ETL')
+    parser.add_argument('--transform-only', nargs='?', const=default_output_path, metavar='ARCHIVO',
+                        help='solo extraer y transformar, sin base de datos: grouped_data se escribe en ARCHIVO '
+                        '(CSV, o Parquet si termina en .parquet; por defecto etl_state/grouped_data.csv)')
+    parser.add_argument('--quarantine', default=default_quarantine_path, metavar='DIRECTORIO',
+                        help='directorio donde se guardan las observaciones rechazadas por la validación (por defecto etl_state/cuarentena)')
+    parser.add_argument('--resume', action='store_true',
+                        help='reanudar la última carga interrumpida desde su checkpoint, omitiendo los lotes ya confirmados')
+    parser.add_argument('--checkpoint', default=default_checkpoint_path, metavar='DIRECTORIO',
+                        help='directorio donde se guarda la salida de la transformación hasta que la carga termina (por defecto etl_state/checkpoint)')
+    parser.add_argument('--precipitaciones', action='append', metavar='RUTA',
+                        help='archivo, directorio o patrón glob con los CSV de precipitaciones, repetible (por defecto data/precipitaciones.csv)')
+    parser.add_argument('--temperaturas', action='append', metavar='RUTA',
+                        help='archivo, directorio o patrón glob con los CSV de temperaturas, repetible (por defecto data/temperaturas.csv)')
+    parser.add_argument('--read-workers', type=int, default=default_read_workers,
+                        help='hilos para leer los archivos de origen en paralelo')
+    parser.add_argument('--skip-unchanged', action='store_true',
+                        help='omitir los archivos de origen que no cambiaron desde la última carga en la misma base de datos')
+    arguments = parser.parse_args()
+
+    base_files_csv_relative_path = [
+        arguments.precipitaciones or default_base_files_csv_relative_path[0],
+        arguments.temperaturas or default_base_files_csv_relative_path[1]]
+
+    ETL = ETLMeteorologico(base_files_csv_relative_path=base_files_csv_relative_path,
+                           fact_batch_size=arguments.batch_size,
+                           incremental=arguments.incremental,
+                           chunk_size=arguments.chunk_size,
+                           staging_path=arguments.staging,
+                           workers=arguments.workers,
+                           pool_size=arguments.pool_size,
+                           shard_size=arguments.shard_size,
+                           backend=arguments.backend,
+                           metrics_path=arguments.metrics,
+                           profile=arguments.profile,
+                           daily_facts=arguments.daily_facts,
+                           output_path=arguments.transform_only,
+                           quarantine_path=arguments.quarantine,
+                           checkpoint_path=arguments.checkpoint,
+                           resume=arguments.resume,
+                           read_workers=arguments.read_workers,
+                           skip_unchanged=arguments.skip_unchanged)
+
+    if (arguments.drop_daily_before is not None):
+        ETL.drop_daily_facts_before(arguments.drop_daily_before)
+        return
+
     ETL.run()
 
 if __name__ == '__main__':
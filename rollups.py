@@ -0,0 +1,66 @@
+from warehouse_schema import agg_estacion_annio, agg_region_annio, agg_region_mes, dim_periodo, fact_temprec
+from sqlalchemy import delete, func, insert, select
+
+
+# Columna de los rollups, cómo se obtiene desde los hechos mensuales y cómo se combina al re-agregar.
+# Las sumas se acumulan desde las sumas mensuales de los hechos, no desde sus promedios
+rollup_measures = [
+    ('CANTIDAD_OBSERVACIONES', lambda facts: func.sum(facts.c.CANTIDAD_OBSERVACIONES), func.sum),
+    ('SUMA_TEMPERATURA_MINIMA', lambda facts: func.sum(facts.c.SUMA_TEMPERATURA_MINIMA), func.sum),
+    ('MINIMA_TEMPERATURA_MINIMA', lambda facts: func.min(facts.c.MINIMA_TEMPERATURA_MINIMA), func.min),
+    ('MAXIMA_TEMPERATURA_MINIMA', lambda facts: func.max(facts.c.MAXIMA_TEMPERATURA_MINIMA), func.max),
+    ('SUMA_TEMPERATURA_MAXIMA', lambda facts: func.sum(facts.c.SUMA_TEMPERATURA_MAXIMA), func.sum),
+    ('MINIMA_TEMPERATURA_MAXIMA', lambda facts: func.min(facts.c.MINIMA_TEMPERATURA_MAXIMA), func.min),
+    ('MAXIMA_TEMPERATURA_MAXIMA', lambda facts: func.max(facts.c.MAXIMA_TEMPERATURA_MAXIMA), func.max),
+    ('SUMA_PRECIPITACION', lambda facts: func.sum(facts.c.SUMA_PRECIPITACION), func.sum),
+    ('PRECIPITACION_MINIMA', lambda facts: func.min(facts.c.PRECIPITACION_MINIMA), func.min),
+    ('PRECIPITACION_MAXIMA', lambda facts: func.max(facts.c.PRECIPITACION_MAXIMA), func.max),
+]
+
+
+def fact_measures(facts):
+    return [fact_measure(facts).label(column) for column, fact_measure, combine in rollup_measures]
+
+
+def combined_measures(rollup):
+    return [combine(rollup.c[column]).label(column) for column, fact_measure, combine in rollup_measures]
+
+
+def refresh_rollups(db_connection, period_ids):
+    # Recalcular solo los periodos (y años) tocados por la carga: se borran sus filas y se vuelven
+    # a insertar desde los hechos vigentes con INSERT ... SELECT, sin traer datos al ETL
+    period_ids = sorted(set(period_ids))
+    if (not period_ids):
+        return {}
+
+    years = [row[0] for row in db_connection.execute(
+        select(dim_periodo.c.ANNIO).where(dim_periodo.c.ID_PERIODO.in_(period_ids)).distinct())]
+    current_facts = fact_temprec.c.VIGENTE == 1
+    measure_columns = [column for column, fact_measure, combine in rollup_measures]
+
+    db_connection.execute(delete(agg_region_mes).where(agg_region_mes.c.ID_PERIODO.in_(period_ids)))
+    db_connection.execute(insert(agg_region_mes).from_select(
+        ['ID_REGION', 'ID_PERIODO', *measure_columns],
+        select(fact_temprec.c.ID_REGION, fact_temprec.c.ID_PERIODO, *fact_measures(fact_temprec)).where(
+            current_facts, fact_temprec.c.ID_PERIODO.in_(period_ids)).group_by(
+            fact_temprec.c.ID_REGION, fact_temprec.c.ID_PERIODO)))
+
+    # Región x año se re-agrega desde región x mes, que ya está al día y es mucho más pequeña
+    monthly_periods = agg_region_mes.join(dim_periodo, agg_region_mes.c.ID_PERIODO == dim_periodo.c.ID_PERIODO)
+    db_connection.execute(delete(agg_region_annio).where(agg_region_annio.c.ANNIO.in_(years)))
+    db_connection.execute(insert(agg_region_annio).from_select(
+        ['ID_REGION', 'ANNIO', *measure_columns],
+        select(agg_region_mes.c.ID_REGION, dim_periodo.c.ANNIO, *combined_measures(agg_region_mes)).select_from(
+            monthly_periods).where(dim_periodo.c.ANNIO.in_(years)).group_by(
+            agg_region_mes.c.ID_REGION, dim_periodo.c.ANNIO)))
+
+    fact_periods = fact_temprec.join(dim_periodo, fact_temprec.c.ID_PERIODO == dim_periodo.c.ID_PERIODO)
+    db_connection.execute(delete(agg_estacion_annio).where(agg_estacion_annio.c.ANNIO.in_(years)))
+    db_connection.execute(insert(agg_estacion_annio).from_select(
+        ['ID_ESTACION', 'ANNIO', 'ID_REGION', *measure_columns],
+        select(fact_temprec.c.ID_ESTACION, dim_periodo.c.ANNIO, func.max(fact_temprec.c.ID_REGION),
+               *fact_measures(fact_temprec)).select_from(fact_periods).where(
+            current_facts, dim_periodo.c.ANNIO.in_(years)).group_by(
+            fact_temprec.c.ID_ESTACION, dim_periodo.c.ANNIO)))
+
+    return {'periodos': len(period_ids), 'años': len(years)}
@@ -0,0 +1,76 @@
+import numpy
+import pandas
+
+# Tipos de cada columna de los CSV de origen, aplicados al leerlos. Los enteros se leen con tipos que
+# admiten valores vacíos: esas filas se descartan en la limpieza, que luego aplica compact_dtypes
+observation_dtypes = {
+    'estacion': 'category',
+    'latitud': 'category',
+    'altitud': 'Int16',
+    'año': 'UInt16',
+    'mes': 'UInt8',
+    'dia': 'UInt8',
+}
+
+# Tipos de los enteros en las observaciones limpias, sin valores vacíos
+compact_dtypes = {
+    'altitud': 'int16',
+    'año': 'uint16',
+    'mes': 'uint8',
+    'dia': 'uint8',
+}
+
+precipitation_dtypes = {
+    **observation_dtypes,
+    'precipitacion': 'float32',
+}
+
+temperature_dtypes = {
+    **observation_dtypes,
+    'temperatura_minima': 'float32',
+}
+
+
+def parse_polluted_number(value):
+    # temperatura_maxima trae caracteres coma (,) que se eliminan al leer el archivo
+    value = value.replace(',', '').strip()
+    return float(value) if value else numpy.nan
+
+
+temperature_converters = {
+    'temperatura_maxima': parse_polluted_number,
+}
+
+# Columnas que read_csv entrega en float64 tras aplicar un converter
+temperature_converted_dtypes = {
+    'temperatura_maxima': 'float32',
+}
+
+source_schemas = {
+    'precipitaciones': (precipitation_dtypes, {}, {}),
+    'temperaturas': (temperature_dtypes, temperature_converters, temperature_converted_dtypes),
+}
+
+
+def read_observations(file_path, source_name, **read_csv_arguments):
+    # Leer un CSV de origen aplicando su esquema; con chunksize se entrega un iterador de bloques
+    dtypes, converters, converted_dtypes = source_schemas[source_name]
+    observations = pandas.read_csv(file_path, encoding='latin-1', delimiter=';',
+                                   dtype=dtypes, converters=converters, **read_csv_arguments)
+
+    if ('chunksize' in read_csv_arguments):
+        return (chunk.astype(converted_dtypes) for chunk in observations)
+
+    return observations.astype(converted_dtypes)
+
+
+def bytes_per_row(dataframe):
+    return dataframe.memory_usage(deep=True, index=False).sum() / max(len(dataframe), 1)
+
+
+def empty_observations(source_name):
+    # Observaciones sin filas con las columnas y tipos del esquema, para un origen sin archivos que leer
+    dtypes, converters, converted_dtypes = source_schemas[source_name]
+
+    return pandas.DataFrame({column: pandas.Series(dtype=dtype) for column, dtype in {
+        **dtypes, **converted_dtypes}.items()})
@@ -0,0 +1,104 @@
+import hashlib
+import importlib.util
+import json
+import shutil
+from os import listdir, makedirs, path, rename, stat
+
+import pandas
+
+default_staging_path = path.join(path.dirname(
+    path.realpath(__file__)), 'staging')
+
+# Las observaciones se particionan por año y mes en el área de staging
+partition_columns = ['año', 'mes']
+
+# Versión de la limpieza y la validación que producen las observaciones del staging: cambiarla cuando
+# cambien sus reglas, para no reutilizar observaciones limpiadas con las anteriores
+staging_format_version = 1
+
+
+def source_fingerprint(source_file_paths, catalog_path):
+    # Huella de los CSV de origen a partir de su nombre, tamaño y fecha de modificación, junto con el
+    # contenido del catálogo de estaciones (las observaciones del staging ya están normalizadas con él)
+    # y la versión del formato
+    fingerprint = hashlib.sha256()
+    fingerprint.update(('version|%s\n' % (staging_format_version)).encode('utf-8'))
+    with open(catalog_path, 'rb') as catalog_file:
+        fingerprint.update(hashlib.sha256(catalog_file.read()).digest())
+    for source_file_path in source_file_paths:
+        source_stat = stat(source_file_path)
+        fingerprint.update(('%s|%s|%s\n' % (path.realpath(source_file_path),
+                           source_stat.st_size, source_stat.st_mtime_ns)).encode('utf-8'))
+
+    return fingerprint.hexdigest()[:16]
+
+
+def staging_available():
+    # El staging en Parquet es opcional y depende de pyarrow
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+class StagingCache:
+    def __init__(self, staging_path, key):
+        self.staging_path = staging_path
+        self.key = key
+        self.cache_path = path.join(staging_path, key)
+
+    @classmethod
+    def for_sources(cls, staging_path, source_file_paths, catalog_path):
+        return cls(staging_path, source_fingerprint(source_file_paths, catalog_path))
+
+    @classmethod
+    def current(cls, staging_path):
+        # Versión vigente del staging, para análisis ad-hoc sin conocer la huella de los CSV
+        entries = [entry for entry in listdir(staging_path)
+                   if path.isdir(path.join(staging_path, entry))]
+        if (len(entries) != 1):
+            raise ValueError('Se esperaba una sola versión en %s y hay %s.' % (staging_path, len(entries)))
+
+        return cls(staging_path, entries[0])
+
+    def __frame_path(self, name):
+        return path.join(self.cache_path, name)
+
+    def has(self, name):
+        return path.exists(path.join(self.__frame_path(name), '_schema.json'))
+
+    def write(self, name, dataframe):
+        makedirs(self.cache_path, exist_ok=True)
+        self.__remove_stale_entries()
+
+        # Se escribe en un directorio temporal y se renombra al final, para no dejar particiones a medias
+        frame_path = self.__frame_path(name)
+        temporary_path = frame_path + '.tmp'
+        shutil.rmtree(temporary_path, ignore_errors=True)
+
+        dataframe.to_parquet(temporary_path, engine='pyarrow',
+                             partition_cols=partition_columns, index=False)
+
+        with open(path.join(temporary_path, '_schema.json'), 'w', encoding='utf-8') as schema_file:
+            json.dump({column: str(dtype) for column, dtype in dataframe.dtypes.items()},
+                      schema_file, ensure_ascii=False)
+
+        shutil.rmtree(frame_path, ignore_errors=True)
+        rename(temporary_path, frame_path)
+
+    def read(self, name):
+        frame_path = self.__frame_path(name)
+        with open(path.join(frame_path, '_schema.json'), encoding='utf-8') as schema_file:
+            dtypes = json.load(schema_file)
+
+        # Las columnas de partición vuelven como categorías al final; se restaura el esquema original
+        # y el orden cronológico de las particiones
+        dataframe = pandas.read_parquet(
+            frame_path, engine='pyarrow', memory_map=True)
+        dataframe = dataframe[list(dtypes)].astype(dtypes)
+
+        return dataframe.sort_values(partition_columns, kind='stable', ignore_index=True)
+
+    def __remove_stale_entries(self):
+        # Solo se conserva el staging de la versión actual de los CSV de origen
+        for entry in listdir(self.staging_path):
+            if (entry != self.key):
+                shutil.rmtree(path.join(self.staging_path, entry), ignore_errors=True)
+
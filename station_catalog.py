@@ -0,0 +1,66 @@
+import functools
+import numpy
+import pandas
+from os import path
+
+default_station_catalog_path = path.join(path.dirname(
+    path.realpath(__file__)), 'data', 'estaciones.csv')
+
+
+class StationCatalog:
+    def __init__(self, catalog):
+        # Cada variante de nombre (incluido el nombre canónico) apunta a una estación canónica. Las variantes
+        # se comparan sin espacios al inicio ni al final: el lector de CSV a veces pierde los espacios
+        # iniciales de un nombre al cortar sus bloques de lectura
+        variants = catalog.assign(variante=catalog['variante'].str.strip()).drop_duplicates('variante')
+        self.station_names = variants.set_index('variante')['estacion']
+        self.stations = catalog.drop_duplicates(
+            'estacion').set_index('estacion')[['region', 'latitud', 'altitud']]
+
+    def normalize(self, dataframe, source_name):
+        # Se traducen solo los nombres distintos y el resultado se expande con sus códigos,
+        # en vez de comparar cada fila contra cada variante
+        codes, raw_names = pandas.factorize(dataframe['estacion'])
+        station_names = self.canonical_names(raw_names)
+        regions = station_names.map(self.stations['region'])
+
+        unknown_names = numpy.flatnonzero(regions.isna())
+        if (len(unknown_names)):
+            rows_per_name = numpy.bincount(codes[codes >= 0], minlength=len(raw_names))
+            print('Estaciones desconocidas en %s (se descartan): %s' % (source_name, ', '.join(
+                '"%s" (%s filas)' % (raw_names[name], rows_per_name[name]) for name in unknown_names)))
+
+        dataframe['estacion'] = expand_categorical(station_names, codes)
+        dataframe['region'] = expand_categorical(regions, codes)
+
+        return dataframe
+
+    def canonical_names(self, raw_names):
+        # Nombre canónico de cada nombre leído, sin sus espacios iniciales y finales (NaN si no está en el catálogo)
+        return pandas.Index(raw_names, dtype='object').str.strip().map(self.station_names)
+
+    def reference_coordinates(self, station_attributes):
+        # Coordenadas de referencia del catálogo; si faltan, las de la primera observación
+        observed = station_attributes.set_index('estacion')
+        reference = self.stations[['latitud', 'altitud']].reindex(observed.index)
+
+        return station_attributes.assign(
+            latitud=reference['latitud'].fillna(observed['latitud']).values,
+            altitud=reference['altitud'].fillna(observed['altitud']).values)
+
+
+def expand_categorical(values, codes):
+    # Columna categórica con un valor por fila a partir de los valores de cada código
+    value_codes, categories = pandas.factorize(values, sort=True)
+    row_codes = numpy.append(value_codes, -1)[codes]
+
+    return pandas.Categorical.from_codes(row_codes, categories)
+
+
+@functools.lru_cache(maxsize=None)
+def load_station_catalog(catalog_path=default_station_catalog_path):
+    # El catálogo se lee y compila una sola vez por proceso
+    catalog = pandas.read_csv(catalog_path, delimiter=';', encoding='utf-8', dtype={
+        'variante': str, 'estacion': str, 'region': str}, keep_default_na=False, na_values={'latitud': [''], 'altitud': ['']})
+
+    return StationCatalog(catalog)
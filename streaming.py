@@ -0,0 +1,79 @@
+import numpy
+
+# Columnas comunes a ambos archivos que identifican la estación de una observación
+site_columns = ['estacion', 'latitud', 'altitud', 'region']
+
+
+class ObservationIndex:
+    def __init__(self, value_columns):
+        # Índice compacto del lado derecho del join: una llave entera (sitio, fecha) por fila y las
+        # columnas de valores, sin conservar las columnas de texto de cada observación
+        self.value_columns = value_columns
+        self.sites = None
+        self.keys = None
+        self.key_chunks = []
+        self.value_chunks = {column: [] for column in value_columns}
+
+    def __len__(self):
+        return len(self.keys) if self.keys is not None else sum(len(keys) for keys in self.key_chunks)
+
+    def add(self, dataframe):
+        row_sites, chunk_sites = self.__row_sites(dataframe)
+
+        if (self.sites is None):
+            self.sites = chunk_sites
+        else:
+            new_sites = chunk_sites[~chunk_sites.isin(self.sites)]
+            if (len(new_sites)):
+                self.sites = self.sites.append(new_sites)
+
+        self.key_chunks.append(self.__keys(dataframe, row_sites, chunk_sites))
+        for column in self.value_columns:
+            self.value_chunks[column].append(dataframe[column].to_numpy())
+
+    def build(self):
+        keys = numpy.concatenate(self.key_chunks)
+        order = numpy.argsort(keys, kind='stable')
+
+        self.keys = keys[order]
+        self.values = {column: numpy.concatenate(chunks)[order]
+                       for column, chunks in self.value_chunks.items()}
+        self.key_chunks = []
+        self.value_chunks = {}
+
+    def __row_sites(self, dataframe):
+        # Sitio de cada fila como código entero y tabla de sitios distintos. groupby trabaja sobre los
+        # códigos de las categorías, sin comparar los textos fila por fila
+        grouped = dataframe.groupby(site_columns, observed=True, sort=False)
+        row_sites = grouped.ngroup().fillna(-1).to_numpy(dtype='int64')
+
+        return row_sites, grouped.size().index
+
+    def __keys(self, dataframe, row_sites=None, chunk_sites=None):
+        if (row_sites is None):
+            row_sites, chunk_sites = self.__row_sites(dataframe)
+
+        # Los sitios de la tabla pequeña se buscan en el índice y se expanden a las filas con sus códigos
+        site_codes = numpy.append(self.sites.get_indexer(chunk_sites), -1).astype('int64')[row_sites]
+        dates = (dataframe['año'].to_numpy(dtype='int64') * 10000 + dataframe['mes'].to_numpy(dtype='int64')
+                 * 100 + dataframe['dia'].to_numpy(dtype='int64'))
+
+        # Los sitios desconocidos (código -1) quedan con llave negativa y no coinciden con nada
+        return numpy.where(site_codes >= 0, site_codes * 100000000 + dates, -1)
+
+    def join(self, dataframe):
+        # Equivalente a dataframe.merge(indexado, how='inner'), incluidas las llaves repetidas
+        keys = self.__keys(dataframe)
+        first_match = numpy.searchsorted(self.keys, keys, side='left')
+        matches = numpy.searchsorted(self.keys, keys, side='right') - first_match
+        matches[keys < 0] = 0
+
+        rows = numpy.repeat(numpy.arange(len(dataframe)), matches)
+        offsets = numpy.arange(len(rows)) - numpy.repeat(numpy.cumsum(matches) - matches, matches)
+        positions = first_match[rows] + offsets
+
+        joined_dataframes = dataframe.iloc[rows].reset_index(drop=True)
+        for column in self.value_columns:
+            joined_dataframes[column] = self.values[column][positions]
+
+        return joined_dataframes
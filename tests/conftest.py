@@ -0,0 +1,5 @@
+import sys
+from os import path
+
+# Los módulos del ETL están en la raíz del proyecto, sin paquete
+sys.path.insert(0, path.dirname(path.dirname(path.realpath(__file__))))
@@ -0,0 +1,83 @@
+import numpy
+import pandas
+import pytest
+
+from aggregation import aggregate_observations, aggregations, combine_partial_aggregates, finalize_aggregates, group_columns, partial_aggregates
+
+
+def observations(station_dtype, rows=5000, seed=0):
+    # Observaciones mixtas: estaciones con categorías sin usar y filas sin estación, grupos de una fila,
+    # grupos largos y medidas float32 con NaN, incluido un grupo con una medida completamente vacía
+    rng = numpy.random.default_rng(seed)
+    stations = rng.choice(['Pudahuel', 'Chacalluta', 'Maquehue', None], rows, p=[0.45, 0.35, 0.18, 0.02])
+    dataframe = pandas.DataFrame({
+        'estacion': stations,
+        'mes': rng.integers(1, 13, rows).astype('uint8'),
+        'año': rng.choice([2013, 2016, 2021], rows).astype('uint16'),
+        'dia': rng.integers(1, 29, rows).astype('uint8'),
+    })
+    for measure in aggregations:
+        values = rng.normal(12, 8, rows) * rng.choice([1, 1000], rows, p=[0.95, 0.05])
+        dataframe[measure] = numpy.where(rng.random(rows) < 0.15, numpy.nan, values).astype('float32')
+
+    single_rows = pandas.DataFrame({'estacion': ['Tobalaba', 'Tobalaba'], 'mes': numpy.array([2, 3], dtype='uint8'),
+                                    'año': numpy.array([2019, 2019], dtype='uint16'), 'dia': numpy.array([1, 1], dtype='uint8'),
+                                    **{measure: numpy.array([1.5, 2.5], dtype='float32') for measure in aggregations}})
+    single_rows.loc[1, 'precipitacion'] = numpy.nan
+    dataframe = pandas.concat([dataframe, single_rows], ignore_index=True)
+
+    if (station_dtype == 'category'):
+        dataframe['estacion'] = pandas.Categorical(dataframe['estacion'], categories=[
+            'Tobalaba', 'Pudahuel', 'Sin uso', 'Maquehue', 'Chacalluta'])
+    return dataframe
+
+
+def expected_aggregates(dataframe):
+    # groupby de pandas, llevado al orden de aggregate_observations: código de estación, mes y año
+    expected = dataframe.groupby(group_columns, as_index=False, observed=True).agg(aggregations)
+    if (isinstance(dataframe['estacion'].dtype, pandas.CategoricalDtype)):
+        station_codes = expected[('estacion', '')].cat.codes
+    else:
+        station_codes = expected[('estacion', '')].rank(method='dense')
+    order = numpy.lexsort((expected[('año', '')], expected[('mes', '')], station_codes))
+
+    return expected.iloc[order].reset_index(drop=True)
+
+
+@pytest.mark.parametrize('station_dtype', ['category', 'object'])
+def test_aggregate_observations_matches_groupby(station_dtype):
+    dataframe = observations(station_dtype)
+
+    pandas.testing.assert_frame_equal(aggregate_observations(dataframe), expected_aggregates(dataframe),
+                                      check_exact=True, check_column_type=False)
+
+
+def test_aggregate_observations_order_is_station_code_month_year():
+    grouped_data = aggregate_observations(observations('category'))
+    keys = list(zip(grouped_data[('estacion', '')].cat.codes, grouped_data[('mes', '')], grouped_data[('año', '')]))
+
+    assert keys == sorted(keys)
+
+
+def test_partial_aggregates_by_chunks_match_groupby():
+    # La lectura por bloques combina agregados parciales y debe dar los mismos grupos y valores
+    dataframe = observations('category').dropna(subset=['estacion'])
+    accumulated = None
+    for chunk_start in range(0, len(dataframe), 700):
+        accumulated = combine_partial_aggregates(accumulated, partial_aggregates(
+            dataframe.iloc[chunk_start:chunk_start + 700]))
+
+    grouped_data = finalize_aggregates(accumulated)
+    expected = expected_aggregates(dataframe)
+    keys = [('estacion', ''), ('mes', ''), ('año', '')]
+
+    pandas.testing.assert_frame_equal(
+        grouped_data.astype({('estacion', ''): 'object'}).sort_values(keys).reset_index(drop=True),
+        expected.astype({('estacion', ''): 'object'}).sort_values(keys).reset_index(drop=True),
+        check_dtype=False, check_column_type=False, rtol=1e-5)
+
+
+def test_aggregate_observations_empty():
+    dataframe = observations('category').iloc[0:0]
+
+    assert len(aggregate_observations(dataframe)) == 0
@@ -0,0 +1,72 @@
+import sqlite3
+import sys
+from os import path
+
+import pandas
+import pytest
+
+from ETL_meteorologioco import ETLMeteorologico, default_fact_batch_size
+from load_backends import SQLiteLoadBackend
+
+sys.path.insert(0, path.join(path.dirname(path.dirname(path.realpath(__file__))), 'benchmarks'))
+from synthetic_data import generate  # noqa: E402
+
+
+class FailingLoadBackend(SQLiteLoadBackend):
+    # Falla al insertar el fragmento de hechos número fail_at, como una carga interrumpida
+    def __init__(self, database_path, fail_at):
+        super().__init__(database_path)
+        self.fail_at = fail_at
+        self.fact_inserts = 0
+
+    def insert_rows(self, db_connection, table, records, ignore_duplicates=False):
+        if (table.name == 'fact_temprec'):
+            self.fact_inserts += 1
+            if (self.fact_inserts == self.fail_at):
+                raise RuntimeError('carga interrumpida')
+        return super().insert_rows(db_connection, table, records, ignore_duplicates)
+
+
+@pytest.fixture(scope='module')
+def files(tmp_path_factory):
+    # 5 estaciones x 6 años: 360 grupos (estacion, mes, año), varios fragmentos de 100
+    files, rows = generate(str(tmp_path_factory.mktemp('datos')), 5, 6, 3)
+    return files
+
+
+def run_etl(files, work_dir, backend, **options):
+    etl = ETLMeteorologico([files['precipitaciones'], files['temperaturas']], backend=backend,
+                           station_catalog_path=files['estaciones'], pool_size=1, metrics_path=None,
+                           watermark_directory=work_dir, manifest_directory=None,
+                           quarantine_path=path.join(work_dir, 'cuarentena'),
+                           checkpoint_path=path.join(work_dir, 'checkpoint'), **options)
+    etl.run()
+    return etl
+
+
+def current_facts(database_path):
+    # Hechos vigentes por llave natural, sin los IDs generados por la base de datos
+    with sqlite3.connect(database_path) as connection:
+        facts = pandas.read_sql('''SELECT e.NOMBRE, p.ANNIO, p.MES, f.* FROM fact_temprec f
+            JOIN dim_estacion e USING (ID_ESTACION) JOIN dim_periodo p USING (ID_PERIODO) WHERE f.VIGENTE = 1''',
+                                connection)
+    return facts.drop(columns=['ID_TEMPREC', 'ID_ESTACION', 'ID_PERIODO', 'ID_REGION']).sort_values(
+        ['NOMBRE', 'ANNIO', 'MES']).reset_index(drop=True)
+
+
+@pytest.mark.parametrize('resume_options', [dict(shard_size=200, fact_batch_size=50), dict(shard_size=30)])
+def test_resume_uses_the_sizes_of_the_interrupted_run(files, tmp_path, resume_options):
+    expected_path = str(tmp_path / 'completa.sqlite')
+    run_etl(files, str(tmp_path / 'completa'), SQLiteLoadBackend(expected_path))
+
+    database_path = str(tmp_path / 'reanudada.sqlite')
+    work_dir = str(tmp_path / 'reanudada')
+    with pytest.raises(RuntimeError):
+        run_etl(files, work_dir, FailingLoadBackend(database_path, fail_at=3), shard_size=100)
+
+    etl = run_etl(files, work_dir, SQLiteLoadBackend(database_path), resume=True, **resume_options)
+
+    assert (etl.shard_size, etl.fact_batch_size) == (100, default_fact_batch_size)
+    pandas.testing.assert_frame_equal(current_facts(database_path), current_facts(expected_path))
+    assert len(current_facts(database_path)) == 360
+    assert not path.exists(path.join(work_dir, 'checkpoint'))
@@ -0,0 +1,39 @@
+import sqlite3
+import sys
+from os import path
+
+import pandas
+import pytest
+
+from ETL_meteorologioco import ETLMeteorologico
+from load_backends import SQLiteLoadBackend
+
+sys.path.insert(0, path.join(path.dirname(path.dirname(path.realpath(__file__))), 'benchmarks'))
+from synthetic_data import generate  # noqa: E402
+
+
+@pytest.mark.parametrize('daily_facts', [False, True])
+def test_region_year_rollup_matches_the_observations(tmp_path, daily_facts):
+    # Los promedios región x año recalculados como SUMA / CANTIDAD son los de las observaciones cruzadas
+    files, rows = generate(str(tmp_path / 'datos'), 4, 3, 10)
+    database_path = str(tmp_path / 'almacen.sqlite')
+    etl = ETLMeteorologico([files['precipitaciones'], files['temperaturas']],
+                           backend=SQLiteLoadBackend(database_path), station_catalog_path=files['estaciones'],
+                           metrics_path=None, manifest_directory=None, daily_facts=daily_facts,
+                           watermark_directory=str(tmp_path),
+                           quarantine_path=str(tmp_path / 'cuarentena'), checkpoint_path=str(tmp_path / 'checkpoint'))
+    etl.run()
+
+    observations = etl.joined_dataframes.astype({'region': 'object', 'año': 'int64'}).astype(
+        {'temperatura_minima': 'float64', 'temperatura_maxima': 'float64'})
+    expected = observations.groupby(['region', 'año']).agg(
+        CANTIDAD_OBSERVACIONES=('precipitacion', 'size'), PROMEDIO_TEMPERATURA_MINIMA=('temperatura_minima', 'mean'),
+        PROMEDIO_TEMPERATURA_MAXIMA=('temperatura_maxima', 'mean'))
+
+    with sqlite3.connect(database_path) as connection:
+        rollup = pandas.read_sql('''SELECT r.NOMBRE_REGION AS region, a.ANNIO AS "año", a.CANTIDAD_OBSERVACIONES,
+            a.SUMA_TEMPERATURA_MINIMA / a.CANTIDAD_OBSERVACIONES AS PROMEDIO_TEMPERATURA_MINIMA,
+            a.SUMA_TEMPERATURA_MAXIMA / a.CANTIDAD_OBSERVACIONES AS PROMEDIO_TEMPERATURA_MAXIMA
+            FROM agg_region_annio a JOIN dim_region r USING (ID_REGION)''', connection).set_index(['region', 'año'])
+
+    pandas.testing.assert_frame_equal(rollup.sort_index(), expected.sort_index(), check_dtype=False, rtol=1e-6)
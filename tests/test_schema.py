@@ -0,0 +1,32 @@
+import pandas
+
+from schema import compact_dtypes, read_observations
+from transform import clean_observations
+
+header = 'estacion;latitud;altitud;año;mes;dia;precipitacion\n'
+rows = ["Pudahuel;33&deg 23' 40'' S;482;2013;1;1;0.0\n",
+        "Pudahuel;33&deg 23' 40'' S;;2013;1;2;0.0\n",
+        "Pudahuel;33&deg 23' 40'' S;482;;1;3;0.0\n",
+        "Pudahuel;33&deg 23' 40'' S;482;2013;1;;0.0\n",
+        "Pudahuel;33&deg 23' 40'' S;482;2013;1;5;1.5\n"]
+
+
+def test_blank_integers_are_dropped_by_the_cleaning(tmp_path):
+    # Una altitud o una fecha vacía no detiene la lectura: la limpieza descarta la fila
+    file_path = tmp_path / 'precipitaciones.csv'
+    file_path.write_text(header + ''.join(rows), encoding='latin-1')
+
+    cleaned = clean_observations(read_observations(file_path, 'precipitaciones'))
+
+    assert cleaned['dia'].tolist() == [1, 5]
+    assert {column: str(cleaned[column].dtype) for column in compact_dtypes} == compact_dtypes
+
+
+def test_blank_integers_in_chunks(tmp_path):
+    file_path = tmp_path / 'precipitaciones.csv'
+    file_path.write_text(header + ''.join(rows), encoding='latin-1')
+
+    cleaned = pandas.concat([clean_observations(chunk) for chunk in read_observations(
+        file_path, 'precipitaciones', chunksize=2)])
+
+    assert cleaned['dia'].tolist() == [1, 5]
@@ -0,0 +1,124 @@
+import numpy
+import pandas
+import pytest
+
+from validation import ObservationValidator
+
+
+def observations(rows, source_name='temperaturas'):
+    # Filas (estacion, año, mes, dia, medidas...) con los tipos de las observaciones limpias
+    measures = ['precipitacion'] if source_name == 'precipitaciones' else ['temperatura_minima', 'temperatura_maxima']
+    dataframe = pandas.DataFrame(rows, columns=['estacion', 'año', 'mes', 'dia', *measures])
+
+    return dataframe.astype({'estacion': 'category', 'año': 'uint16', 'mes': 'uint8', 'dia': 'uint8',
+                             **{measure: 'float32' for measure in measures}})
+
+
+def repeated_readings(rows=3000, seed=0):
+    # Lecturas con repeticiones exactas y con valores distintos para la misma llave, separadas por
+    # muchas filas para que caigan en bloques distintos
+    rng = numpy.random.default_rng(seed)
+    dataframe = pandas.DataFrame({
+        'estacion': rng.choice(['Pudahuel', 'Chacalluta', 'Maquehue'], rows),
+        'año': rng.choice([2019, 2020], rows),
+        'mes': rng.integers(1, 13, rows),
+        'dia': rng.integers(1, 29, rows),
+        'temperatura_minima': rng.integers(-5, 15, rows),
+        'temperatura_maxima': rng.integers(15, 30, rows),
+    })
+    exact_copies = dataframe.sample(300, random_state=seed)
+    changed_copies = dataframe.sample(200, random_state=seed + 1).assign(temperatura_maxima=lambda copies: copies[
+        'temperatura_maxima'] + 1)
+
+    return observations(pandas.concat([dataframe, exact_copies, changed_copies]).sample(
+        frac=1, random_state=seed).values.tolist())
+
+
+def validate_in_chunks(dataframe, chunk_size):
+    validator = ObservationValidator()
+    accepted = pandas.concat([validator.validate(dataframe.iloc[start:start + chunk_size], 'temperaturas')
+                              for start in range(0, len(dataframe), chunk_size)])
+
+    return accepted, validator.rejected_rows()
+
+
+@pytest.mark.parametrize('chunk_size', [13, 250, 1000])
+def test_duplicates_do_not_depend_on_the_chunk_size(chunk_size):
+    dataframe = repeated_readings()
+    expected_accepted, expected_rejected = validate_in_chunks(dataframe, len(dataframe))
+    accepted, rejected = validate_in_chunks(dataframe, chunk_size)
+
+    counts = rejected['motivo'].value_counts()
+    assert counts.to_dict() == expected_rejected['motivo'].value_counts().to_dict()
+    assert counts['duplicado'] > 0 and counts['llave_duplicada'] > 0
+    pandas.testing.assert_frame_equal(accepted, expected_accepted, check_categorical=False)
+    assert list(rejected.index) == list(expected_rejected.index)
+    assert not accepted.duplicated(['estacion', 'año', 'mes', 'dia']).any()
+
+
+def test_first_reading_is_kept():
+    dataframe = observations([
+        ['Pudahuel', 2020, 1, 1, 5.0, 20.0],
+        ['Pudahuel', 2020, 1, 1, 5.0, 21.0],
+        ['Pudahuel', 2020, 1, 1, 5.0, 20.0],
+        ['Chacalluta', 2020, 1, 1, 5.0, 20.0],
+    ])
+    validator = ObservationValidator()
+    accepted = validator.validate(dataframe.iloc[:2], 'temperaturas')
+    accepted = pandas.concat([accepted, validator.validate(dataframe.iloc[2:], 'temperaturas')])
+
+    assert list(accepted.index) == [0, 3]
+    assert validator.rejected_rows()['motivo'].tolist() == ['llave_duplicada', 'duplicado']
+
+
+def test_sources_are_deduplicated_separately():
+    validator = ObservationValidator()
+    validator.validate(observations([['Pudahuel', 2020, 1, 1, 0.5]], 'precipitaciones'), 'precipitaciones')
+    accepted = validator.validate(observations([['Pudahuel', 2020, 1, 1, 5.0, 20.0]]), 'temperaturas')
+
+    assert len(accepted) == 1
+
+
+@pytest.mark.parametrize('row, reason', [
+    (['Pudahuel', 2021, 2, 29, 5.0, 20.0], 'fecha_invalida'),
+    (['Pudahuel', 2020, 13, 1, 5.0, 20.0], 'fecha_invalida'),
+    (['Pudahuel', 2020, 4, 31, 5.0, 20.0], 'fecha_invalida'),
+    (['Pudahuel', 2020, 1, 0, 5.0, 20.0], 'fecha_invalida'),
+    (['Pudahuel', 2020, 1, 1, -95.0, 20.0], 'temperatura_fuera_de_rango'),
+    (['Pudahuel', 2020, 1, 1, 5.0, 61.0], 'temperatura_fuera_de_rango'),
+    (['Pudahuel', 2020, 1, 1, 25.0, 20.0], 'minima_mayor_que_maxima'),
+    (['Pudahuel', 2021, 2, 29, 25.0, 99.0], 'fecha_invalida'),
+])
+def test_temperature_range_checks(row, reason):
+    validator = ObservationValidator()
+    accepted = validator.validate(observations([row, ['Pudahuel', 2020, 2, 29, 5.0, 20.0]]), 'temperaturas')
+
+    assert len(accepted) == 1
+    assert validator.rejected_rows()['motivo'].tolist() == [reason]
+
+
+@pytest.mark.parametrize('precipitation, reason', [(-0.1, 'precipitacion_negativa'),
+                                                   (2000.5, 'precipitacion_fuera_de_rango')])
+def test_precipitation_range_checks(precipitation, reason):
+    validator = ObservationValidator()
+    accepted = validator.validate(observations([['Pudahuel', 2020, 1, 1, precipitation],
+                                                ['Pudahuel', 2020, 1, 2, 2000.0]], 'precipitaciones'), 'precipitaciones')
+
+    assert len(accepted) == 1
+    assert validator.rejected_rows()['motivo'].tolist() == [reason]
+
+
+def test_rows_without_station_are_only_range_checked():
+    # Sin estación no hay llave: dos lecturas del mismo día no son duplicados entre sí ni de otra estación
+    dataframe = observations([
+        [None, 2020, 1, 1, 5.0, 20.0],
+        [None, 2020, 1, 1, 6.0, 22.0],
+        [None, 2020, 1, 1, 5.0, 20.0],
+        ['Pudahuel', 2020, 1, 1, 5.0, 20.0],
+        [None, 2020, 1, 32, 5.0, 20.0],
+    ])
+    validator = ObservationValidator()
+    accepted = validator.validate(dataframe, 'temperaturas')
+
+    assert list(accepted.index) == [0, 1, 2, 3]
+    assert validator.rejected_rows()['motivo'].tolist() == ['fecha_invalida']
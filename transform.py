@@ -0,0 +1,100 @@
+import collections
+import os
+
+import pandas
+
+from aggregation import aggregate_observations, observation_dates, station_attributes
+from coordinates import parse_coordinates
+from instrumentation import RunMetrics
+from schema import compact_dtypes
+from streaming import ObservationIndex
+from validation import ObservationValidator
+
+TransformResult = collections.namedtuple('TransformResult', [
+    'dataframe_precipitaciones', 'dataframe_temperaturas', 'joined_dataframes', 'grouped_data', 'station_attributes',
+    'rejected', 'timings'])
+
+
+def clean_observations(dataframe):
+    # Los nombres de estación y la región ya vienen normalizados con el catálogo de estaciones
+
+    # Eliminar registros que tengan campos en "NaN"; sin ellos los enteros pasan a sus tipos compactos
+    dataframe = dataframe.dropna().astype(compact_dtypes)
+
+    # Transformar formato de latitud (con "&deg" o "°") a grados decimales
+    return dataframe.assign(latitud=parse_coordinates(dataframe['latitud']))
+
+
+def filter_delta(dataframe_precipitaciones, dataframe_temperaturas, watermark_dates):
+    # Conservar completos los meses de cada estación que tienen observaciones posteriores a su
+    # última fecha cargada, para recalcular sus agregados desde cero
+    affected_groups = []
+    for dataframe in (dataframe_precipitaciones, dataframe_temperaturas):
+        new_rows = ~(observation_dates(dataframe) <= dataframe['estacion'].astype(
+            'object').map(watermark_dates))
+        affected_groups.append(
+            dataframe.loc[new_rows, ['estacion', 'año', 'mes']].astype({'estacion': 'object'}))
+
+    affected_groups = pandas.MultiIndex.from_frame(
+        pandas.concat(affected_groups).drop_duplicates())
+
+    return [dataframe.loc[pandas.MultiIndex.from_frame(dataframe[['estacion', 'año', 'mes']].astype(
+        {'estacion': 'object'})).isin(affected_groups)] for dataframe in (dataframe_precipitaciones, dataframe_temperaturas)]
+
+
+def join_observations(dataframe_precipitaciones, dataframe_temperaturas):
+    # Dataframe de temperatura y precipitacion juntos por campos en común. Equivale a merge(how='inner')
+    # sobre todas las columnas comunes, pero cruza una llave entera (sitio, fecha) por fila con
+    # búsqueda binaria en vez de comparar textos y decimales
+    temperature_index = ObservationIndex(['temperatura_minima', 'temperatura_maxima'])
+    temperature_index.add(dataframe_temperaturas)
+    temperature_index.build()
+
+    return temperature_index.join(dataframe_precipitaciones)
+
+
+def transform_observations(dataframe_precipitaciones, dataframe_temperaturas, cleaned=False, watermark_dates=None,
+                           metrics=None):
+    # Cada paso se registra como etapa en metrics; timings resume sus tiempos
+    metrics = metrics if metrics is not None else RunMetrics()
+    first_stage = len(metrics.stages)
+
+    with metrics.stage('transform.limpieza', len(dataframe_precipitaciones) + len(dataframe_temperaturas)) as stage:
+        if (not cleaned):
+            dataframe_precipitaciones = clean_observations(dataframe_precipitaciones)
+            dataframe_temperaturas = clean_observations(dataframe_temperaturas)
+        stage['rows_out'] = len(dataframe_precipitaciones) + len(dataframe_temperaturas)
+
+    # Descartar valores imposibles y lecturas duplicadas antes del join, que multiplicaría los duplicados
+    with metrics.stage('transform.validacion', stage['rows_out']) as stage:
+        validator = ObservationValidator()
+        dataframe_precipitaciones = validator.validate(dataframe_precipitaciones, 'precipitaciones')
+        dataframe_temperaturas = validator.validate(dataframe_temperaturas, 'temperaturas')
+        stage['rows_out'] = len(dataframe_precipitaciones) + len(dataframe_temperaturas)
+
+    # En modo incremental, solo se cruzan y agregan los meses con observaciones nuevas
+    with metrics.stage('transform.join', stage['rows_out']) as stage:
+        if (watermark_dates is not None):
+            joined_dataframes = join_observations(*filter_delta(
+                dataframe_precipitaciones, dataframe_temperaturas, watermark_dates))
+        else:
+            joined_dataframes = join_observations(
+                dataframe_precipitaciones, dataframe_temperaturas)
+        stage['rows_out'] = len(joined_dataframes)
+
+    # Resumir con promedio y minmax para 'temperatura_minima', 'temperatura_maxima' y 'precipitacion'
+    with metrics.stage('transform.agregacion', len(joined_dataframes)) as stage:
+        grouped_data = aggregate_observations(joined_dataframes)
+        attributes = station_attributes(joined_dataframes)
+        stage['rows_out'] = len(grouped_data)
+
+    timings = {record['stage'].split('.')[-1]: record['wall_s'] for record in metrics.stages[first_stage:]}
+
+    return TransformResult(dataframe_precipitaciones, dataframe_temperaturas, joined_dataframes, grouped_data, attributes,
+                           validator.rejected_rows(), timings)
+
+
+def transform_station(station, dataframe_precipitaciones, dataframe_temperaturas, cleaned, watermark_dates):
+    # Punto de entrada de cada tarea del pool de procesos: transforma las observaciones de una estación
+    return station, os.getpid(), transform_observations(
+        dataframe_precipitaciones, dataframe_temperaturas, cleaned, watermark_dates)
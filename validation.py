@@ -0,0 +1,150 @@
+import numpy
+import pandas
+from os import makedirs, path
+
+default_quarantine_path = path.join(path.dirname(
+    path.realpath(__file__)), 'etl_state', 'cuarentena')
+
+# Rangos físicamente posibles de cada medida (mm diarios y °C)
+physical_bounds = {
+    'precipitacion': (0, 2000),
+    'temperatura_minima': (-90, 60),
+    'temperatura_maxima': (-90, 60),
+}
+
+# Días de cada mes (febrero sin bisiesto), indexados por número de mes
+month_days = numpy.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+def invalid_dates(dataframe):
+    years = dataframe['año'].to_numpy().astype('int64')
+    months = dataframe['mes'].to_numpy().astype('int64')
+    days = dataframe['dia'].to_numpy().astype('int64')
+
+    valid_months = (months >= 1) & (months <= 12)
+    leap_years = (years % 4 == 0) & ((years % 100 != 0) | (years % 400 == 0))
+    last_days = month_days[numpy.where(valid_months, months, 0)] + (leap_years & (months == 2))
+
+    return ~valid_months | (days < 1) | (days > last_days)
+
+
+def range_checks(dataframe):
+    # Motivo de rechazo y filas que lo cumplen, en orden de prioridad
+    checks = [('fecha_invalida', invalid_dates(dataframe))]
+
+    if ('precipitacion' in dataframe):
+        precipitation = dataframe['precipitacion'].to_numpy()
+        checks.append(('precipitacion_negativa', precipitation < physical_bounds['precipitacion'][0]))
+        checks.append(('precipitacion_fuera_de_rango', precipitation > physical_bounds['precipitacion'][1]))
+
+    for column in ('temperatura_minima', 'temperatura_maxima'):
+        if (column in dataframe):
+            lower_bound, upper_bound = physical_bounds[column]
+            temperature = dataframe[column].to_numpy()
+            checks.append(('temperatura_fuera_de_rango', (temperature < lower_bound) | (temperature > upper_bound)))
+
+    if ('temperatura_minima' in dataframe and 'temperatura_maxima' in dataframe):
+        checks.append(('minima_mayor_que_maxima', dataframe['temperatura_minima'].to_numpy() >
+                       dataframe['temperatura_maxima'].to_numpy()))
+
+    return checks
+
+
+class ObservationValidator:
+    def __init__(self):
+        # Llaves ya aceptadas por archivo de origen y la huella de la fila aceptada con cada una, para
+        # detectar duplicados entre bloques
+        self.seen_keys = {}
+        self.seen_hashes = {}
+        self.station_codes = {}
+        self.rejected = []
+
+    def validate(self, dataframe, source_name):
+        # Una sola pasada vectorizada: primero los valores imposibles y luego los duplicados entre las
+        # filas válidas, conservando la primera lectura de cada (estacion, año, mes, dia). Una lectura
+        # posterior idéntica a la aceptada es un duplicado exacto, y si difiere es una llave duplicada, en
+        # el mismo bloque o en uno anterior. Devuelve las filas válidas y acumula las rechazadas con su
+        # motivo en self.rejected
+        checks = range_checks(dataframe)
+        reasons = [reason for reason, rows in checks] + ['llave_duplicada', 'duplicado']
+        # Motivo de cada fila como índice en reasons (-1 si es válida)
+        reason_codes = numpy.select([rows for reason, rows in checks], numpy.arange(len(checks)), default=-1)
+
+        # Las filas sin estación no tienen llave: solo se revisan sus rangos
+        keys = self.__keys(dataframe)
+        valid_positions = numpy.flatnonzero((reason_codes < 0) & (keys >= 0))
+        valid_keys = keys[valid_positions]
+        valid_hashes = pandas.util.hash_pandas_object(dataframe.iloc[valid_positions], index=False).to_numpy()
+
+        # Llaves repetidas: ordenadas, la primera de cada tramo es la fila aceptada y las demás son
+        # lecturas posteriores de la misma llave
+        key_order = numpy.argsort(valid_keys, kind='stable')
+        sorted_keys = valid_keys[key_order]
+        first_reads = numpy.append(True, sorted_keys[1:] != sorted_keys[:-1])[:len(sorted_keys)]
+        accepted_positions = key_order[numpy.flatnonzero(first_reads)]
+
+        repeated = numpy.zeros(len(valid_keys), dtype=bool)
+        repeated[key_order] = ~first_reads
+        accepted_hashes = numpy.empty_like(valid_hashes)
+        accepted_hashes[key_order] = valid_hashes[accepted_positions][numpy.cumsum(first_reads) - 1]
+
+        seen_keys = self.seen_keys.get(source_name)
+        if (seen_keys is not None and len(seen_keys)):
+            seen_positions = numpy.minimum(numpy.searchsorted(seen_keys, valid_keys), len(seen_keys) - 1)
+            seen_rows = seen_keys[seen_positions] == valid_keys
+            repeated |= seen_rows
+            accepted_hashes[seen_rows] = self.seen_hashes[source_name][seen_positions[seen_rows]]
+            accepted_positions = accepted_positions[~seen_rows[accepted_positions]]
+
+        if (repeated.any()):
+            reason_codes[valid_positions[repeated]] = len(checks)
+            reason_codes[valid_positions[repeated & (valid_hashes == accepted_hashes)]] = len(checks) + 1
+
+        # Llaves aceptadas en este bloque, ordenadas junto a las anteriores para buscarlas en los siguientes
+        new_keys = valid_keys[accepted_positions]
+        new_hashes = valid_hashes[accepted_positions]
+        if (seen_keys is not None):
+            new_keys = numpy.concatenate([seen_keys, new_keys])
+            new_hashes = numpy.concatenate([self.seen_hashes[source_name], new_hashes])
+        seen_order = numpy.argsort(new_keys, kind='stable')
+        self.seen_keys[source_name] = new_keys[seen_order]
+        self.seen_hashes[source_name] = new_hashes[seen_order]
+
+        rejected_rows = reason_codes >= 0
+        if (rejected_rows.any()):
+            self.rejected.append(dataframe.loc[rejected_rows].assign(
+                origen=source_name, motivo=numpy.array(reasons, dtype='object')[reason_codes[rejected_rows]]))
+
+        return dataframe.loc[~rejected_rows]
+
+    def rejected_rows(self):
+        if (not self.rejected):
+            return pandas.DataFrame(columns=['origen', 'motivo'])
+
+        return pandas.concat([rejected.astype({'estacion': 'object'}) for rejected in self.rejected], ignore_index=True)
+
+    def __keys(self, dataframe):
+        # Llave entera por fila: código de estación y fecha AAAAMMDD, con códigos estables entre bloques
+        # (negativa si falta la estación)
+        stations = dataframe['estacion'].astype('category')
+        category_codes = numpy.array([self.station_codes.setdefault(station, len(self.station_codes))
+                                      for station in stations.cat.categories], dtype='int64')
+        dates = (dataframe['año'].to_numpy().astype('int64') * 10000 + dataframe['mes'].to_numpy().astype('int64') * 100
+                 + dataframe['dia'].to_numpy().astype('int64'))
+
+        return numpy.append(category_codes, -1)[stations.cat.codes.to_numpy()] * 100000000 + dates
+
+
+def rejection_counts(rejected):
+    # Filas rechazadas por estación y motivo
+    return rejected.groupby(['estacion', 'motivo']).size().unstack(fill_value=0)
+
+
+def write_quarantine(rejected, quarantine_path, run_id):
+    makedirs(quarantine_path, exist_ok=True)
+    quarantine_file_path = path.join(quarantine_path, 'cuarentena-%s.csv' % (run_id))
+
+    columns = ['origen', 'motivo', *[column for column in rejected.columns if column not in ('origen', 'motivo')]]
+    rejected[columns].to_csv(quarantine_file_path, index=False)
+
+    return quarantine_file_path
@@ -0,0 +1,132 @@
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, MetaData, String, Table, text
+
+# Modelo estrella de create_database.sql. El ETL lo usa en vez de reflejar las tablas al conectar, y los
+# backends que crean el esquema por su cuenta (SQLite) lo crean con create_all
+metadata = MetaData()
+
+dim_estacion = Table(
+    'dim_estacion', metadata,
+    Column('ID_ESTACION', Integer, primary_key=True, autoincrement=True),
+    Column('NOMBRE', String(100)),
+    Column('LATITUD', Float),
+    Column('ALTITUD', Float),
+    Column('VIGENTE', Boolean, server_default=text('1')),
+    # Llave natural única: los miembros se insertan ignorando los que ya existen
+    Index('NOMBRE', 'NOMBRE', unique=True),
+)
+
+dim_periodo = Table(
+    'dim_periodo', metadata,
+    Column('ID_PERIODO', Integer, primary_key=True, autoincrement=True),
+    Column('ANNIO', Integer),
+    Column('MES', Integer),
+    Column('VIGENTE', Boolean, server_default=text('1')),
+    Index('ANNIO_MES', 'ANNIO', 'MES', unique=True),
+)
+
+dim_region = Table(
+    'dim_region', metadata,
+    Column('ID_REGION', Integer, primary_key=True, autoincrement=True),
+    Column('NOMBRE_REGION', String(100)),
+    Column('VIGENTE', Boolean, server_default=text('1')),
+    Index('NOMBRE_REGION', 'NOMBRE_REGION', unique=True),
+)
+
+fact_temprec = Table(
+    'fact_temprec', metadata,
+    Column('ID_TEMPREC', Integer, primary_key=True, autoincrement=True),
+    Column('ID_PERIODO', Integer, ForeignKey('dim_periodo.ID_PERIODO'), nullable=False, index=True),
+    Column('ID_ESTACION', Integer, ForeignKey('dim_estacion.ID_ESTACION'), nullable=False, index=True),
+    Column('ID_REGION', Integer, ForeignKey('dim_region.ID_REGION'), nullable=False, index=True),
+    Column('MINIMA_TEMPERATURA_MAXIMA', Float, nullable=False),
+    Column('MAXIMA_TEMPERATURA_MAXIMA', Float, nullable=False),
+    Column('MINIMA_TEMPERATURA_MINIMA', Float, nullable=False),
+    Column('MAXIMA_TEMPERATURA_MINIMA', Float, nullable=False),
+    Column('PROMEDIO_TEMPERATURA_MINIMA', Float, nullable=False),
+    Column('PROMEDIO_TEMPERATURA_MAXIMA', Float, nullable=False),
+    Column('SUMA_TEMPERATURA_MINIMA', Float(precision=53), nullable=False, server_default=text('0')),
+    Column('SUMA_TEMPERATURA_MAXIMA', Float(precision=53), nullable=False, server_default=text('0')),
+    Column('SUMA_PRECIPITACION', Float(precision=53), nullable=False),
+    Column('PROMEDIO_PRECIPITACION', Float, nullable=False),
+    Column('PRECIPITACION_MAXIMA', Float, nullable=False),
+    Column('PRECIPITACION_MINIMA', Float, nullable=False),
+    Column('CANTIDAD_OBSERVACIONES', Integer, nullable=False, server_default=text('0')),
+    Column('VIGENTE', Boolean, server_default=text('1')),
+    # Índices compuestos para los hechos vigentes por estación o región y periodo
+    Index('ESTACION_PERIODO_VIGENTE', 'ID_ESTACION', 'ID_PERIODO', 'VIGENTE'),
+    Index('REGION_PERIODO_VIGENTE', 'ID_REGION', 'ID_PERIODO', 'VIGENTE'),
+)
+
+
+def rollup_measure_columns():
+    # Componentes aditivos de cada medida: con suma y cantidad se recalcula el promedio de forma exacta.
+    # Las sumas son de doble precisión (double en create_database.sql)
+    return [
+        Column('CANTIDAD_OBSERVACIONES', Integer, nullable=False),
+        Column('SUMA_TEMPERATURA_MINIMA', Float(precision=53), nullable=False),
+        Column('MINIMA_TEMPERATURA_MINIMA', Float, nullable=False),
+        Column('MAXIMA_TEMPERATURA_MINIMA', Float, nullable=False),
+        Column('SUMA_TEMPERATURA_MAXIMA', Float(precision=53), nullable=False),
+        Column('MINIMA_TEMPERATURA_MAXIMA', Float, nullable=False),
+        Column('MAXIMA_TEMPERATURA_MAXIMA', Float, nullable=False),
+        Column('SUMA_PRECIPITACION', Float(precision=53), nullable=False),
+        Column('PRECIPITACION_MINIMA', Float, nullable=False),
+        Column('PRECIPITACION_MAXIMA', Float, nullable=False),
+    ]
+
+
+agg_region_mes = Table(
+    'agg_region_mes', metadata,
+    Column('ID_REGION', Integer, ForeignKey('dim_region.ID_REGION'), primary_key=True),
+    Column('ID_PERIODO', Integer, ForeignKey('dim_periodo.ID_PERIODO'), primary_key=True),
+    *rollup_measure_columns(),
+    Index('PERIODO_REGION', 'ID_PERIODO', 'ID_REGION'),
+)
+
+agg_region_annio = Table(
+    'agg_region_annio', metadata,
+    Column('ID_REGION', Integer, ForeignKey('dim_region.ID_REGION'), primary_key=True),
+    Column('ANNIO', Integer, primary_key=True),
+    *rollup_measure_columns(),
+    Index('ANNIO_REGION', 'ANNIO', 'ID_REGION'),
+)
+
+agg_estacion_annio = Table(
+    'agg_estacion_annio', metadata,
+    Column('ID_ESTACION', Integer, ForeignKey('dim_estacion.ID_ESTACION'), primary_key=True),
+    Column('ANNIO', Integer, primary_key=True),
+    Column('ID_REGION', Integer, ForeignKey('dim_region.ID_REGION'), nullable=False),
+    *rollup_measure_columns(),
+    Index('ANNIO_ESTACION', 'ANNIO', 'ID_ESTACION'),
+)
+
+# Hechos diarios (opcional): una fila por observación cruzada de joined_dataframes. En MySQL la tabla
+# se particiona por rango de ANNIO (ver create_database.sql), por lo que allí ANNIO se suma a la llave
+# primaria y no hay llaves foráneas, que InnoDB no admite en tablas particionadas
+fact_temprec_diaria = Table(
+    'fact_temprec_diaria', metadata,
+    Column('ID_TEMPREC_DIARIA', Integer, primary_key=True, autoincrement=True),
+    Column('ANNIO', Integer, nullable=False),
+    Column('MES', Integer, nullable=False),
+    Column('DIA', Integer, nullable=False),
+    Column('ID_PERIODO', Integer, nullable=False),
+    Column('ID_ESTACION', Integer, nullable=False),
+    Column('ID_REGION', Integer, nullable=False),
+    Column('TEMPERATURA_MINIMA', Float),
+    Column('TEMPERATURA_MAXIMA', Float),
+    Column('PRECIPITACION', Float),
+    # Rangos de fechas por estación o región, y derivación de los hechos mensuales por periodo
+    Index('ESTACION_FECHA', 'ID_ESTACION', 'ANNIO', 'MES', 'DIA'),
+    Index('REGION_FECHA', 'ID_REGION', 'ANNIO', 'MES', 'DIA'),
+    Index('PERIODO_ESTACION', 'ID_PERIODO', 'ID_ESTACION'),
+)
+
+# Lotes de la carga confirmados por ejecución, registrados en la misma transacción que sus filas para
+# reanudar una carga interrumpida desde el último lote confirmado
+etl_checkpoint = Table(
+    'etl_checkpoint', metadata,
+    Column('RUN_ID', String(64), primary_key=True),
+    Column('ETAPA', String(50), primary_key=True),
+    Column('LOTE', Integer, primary_key=True, autoincrement=False),
+    Column('FECHA', DateTime, server_default=text('CURRENT_TIMESTAMP')),
+)